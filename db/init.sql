@@ -9,6 +9,10 @@ CREATE TABLE IF NOT EXISTS users(
   created_at TIMESTAMP NOT NULL DEFAULT now()
 );
 
+-- Nivel numérico del rol (ver rbac.ROLE_HIERARCHY) para autorizar con una sola comparación.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS role_level SMALLINT
+  GENERATED ALWAYS AS (CASE role WHEN 'admin' THEN 2 WHEN 'supervisor' THEN 1 ELSE 0 END) STORED;
+
 CREATE TABLE IF NOT EXISTS products(
   item_code TEXT PRIMARY KEY,
   item_name TEXT NOT NULL,
@@ -29,13 +33,25 @@ CREATE TABLE IF NOT EXISTS products(
 CREATE TABLE IF NOT EXISTS stock(
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   item_code TEXT NOT NULL REFERENCES products(item_code),
-  lot TEXT NULL,
-  serial TEXT NULL,
+  lot TEXT NOT NULL DEFAULT '',
+  serial TEXT NOT NULL DEFAULT '',
   expiry DATE NULL,
   location TEXT NOT NULL DEFAULT 'MAIN',
   qty INT NOT NULL DEFAULT 0
 );
 
+-- Bases creadas con lot/serial nulos: normalizar a '' antes de exigir NOT NULL.
+UPDATE stock SET lot = '' WHERE lot IS NULL;
+UPDATE stock SET serial = '' WHERE serial IS NULL;
+ALTER TABLE stock
+  ALTER COLUMN lot SET DEFAULT '',
+  ALTER COLUMN lot SET NOT NULL,
+  ALTER COLUMN serial SET DEFAULT '',
+  ALTER COLUMN serial SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_stock_item_lot_serial_location
+  ON stock (item_code, lot, serial, location);
+
 CREATE TABLE IF NOT EXISTS moves(
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   type TEXT NOT NULL CHECK (type IN ('inbound','outbound','transfer','return')),
@@ -71,6 +87,8 @@ CREATE TABLE IF NOT EXISTS audit(
   ts TIMESTAMP NOT NULL DEFAULT now()
 );
 
+CREATE INDEX IF NOT EXISTS ix_audit_ts ON audit (ts);
+
 DO $$
 BEGIN
   IF EXISTS (
@@ -123,6 +141,8 @@ CREATE TABLE IF NOT EXISTS print_jobs(
   updated_at TIMESTAMP NOT NULL DEFAULT now()
 );
 
+CREATE INDEX IF NOT EXISTS ix_print_jobs_status_created_at ON print_jobs (status, created_at);
+
 INSERT INTO users(username, password_hash, role)
 VALUES ('admin', '$2b$12$1nqmxCFIvossKXkg0vvicuKEGDYZUtm1gea3xMN2rf4hZ8alJFvum', 'admin')
 ON CONFLICT DO NOTHING;
@@ -7,11 +7,16 @@ para obtener trabajos de impresión y enviarlos al spooler de Windows.
 import json
 import logging
 import os
+import random
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 try:  # pragma: no cover - dependencia Windows
     import win32print  # type: ignore
@@ -22,6 +27,11 @@ CONFIG_PATH = Path(__file__).with_name("config.yaml")
 LOGGER = logging.getLogger("print-agent")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
+# Factor de crecimiento del intervalo cuando la cola está vacía.
+IDLE_BACKOFF_FACTOR = 1.3
+# Hilos para enviar ACKs mientras la impresora sigue con el siguiente trabajo.
+ACK_WORKERS = 2
+
 
 def load_config() -> dict:
     import yaml  # type: ignore
@@ -30,24 +40,118 @@ def load_config() -> dict:
         return yaml.safe_load(fh)
 
 
-def send_raw_to_printer(printer_name: str, raw_data: str) -> None:
-    if win32print is None:
-        if os.name == "nt":  # pragma: no cover - interacción con UI
-            temp_path = Path(tempfile.gettempdir()) / f"zpl_job_{int(time.time())}.zpl"
-            temp_path.write_text(raw_data, encoding="utf-8")
-            LOGGER.warning("win32print no disponible; abriendo archivo %s para impresión manual", temp_path)
-            os.startfile(str(temp_path))  # type: ignore[attr-defined]
-            return
-        raise RuntimeError("win32print no disponible en este entorno")
-    handle = win32print.OpenPrinter(printer_name)
-    try:
-        job = win32print.StartDocPrinter(handle, 1, ("Picking", None, "RAW"))
-        win32print.StartPagePrinter(handle)
-        win32print.WritePrinter(handle, raw_data.encode("utf-8"))
-        win32print.EndPagePrinter(handle)
-        win32print.EndDocPrinter(handle)
-    finally:
-        win32print.ClosePrinter(handle)
+class PrinterHandle:
+    """Handle del spooler de Windows reutilizado entre trabajos.
+
+    Se abre al primer trabajo y se mantiene abierto; cada trabajo solo se
+    encierra entre StartDocPrinter/EndDocPrinter. Ante un error se cierra y
+    el siguiente trabajo lo vuelve a abrir.
+    """
+
+    def __init__(self, printer_name: str) -> None:
+        self.printer_name = printer_name
+        self._handle = None
+
+    def __enter__(self) -> "PrinterHandle":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def print_raw(self, raw_data: str) -> None:
+        if win32print is None:
+            if os.name == "nt":  # pragma: no cover - interacción con UI
+                temp_path = Path(tempfile.gettempdir()) / f"zpl_job_{int(time.time())}.zpl"
+                temp_path.write_text(raw_data, encoding="utf-8")
+                LOGGER.warning("win32print no disponible; abriendo archivo %s para impresión manual", temp_path)
+                os.startfile(str(temp_path))  # type: ignore[attr-defined]
+                return
+            raise RuntimeError("win32print no disponible en este entorno")
+        if self._handle is None:
+            self._handle = win32print.OpenPrinter(self.printer_name)
+        try:
+            win32print.StartDocPrinter(self._handle, 1, ("Picking", None, "RAW"))
+            win32print.StartPagePrinter(self._handle)
+            win32print.WritePrinter(self._handle, raw_data.encode("utf-8"))
+            win32print.EndPagePrinter(self._handle)
+            win32print.EndDocPrinter(self._handle)
+        except Exception:
+            # pywintypes.error u otro fallo: el handle puede quedar inválido.
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._handle is not None:
+            try:
+                win32print.ClosePrinter(self._handle)
+            except Exception:  # pragma: no cover - handle ya inválido
+                LOGGER.warning("No se pudo cerrar el handle de %s", self.printer_name)
+            self._handle = None
+
+
+class JobDispatcher:
+    """Imprime en orden en un único hilo y envía los ACK en paralelo.
+
+    El sondeo no espera a los ACK; los trabajos en curso se recuerdan para no
+    reimprimirlos si la API todavía los devuelve como ``queued``.
+    """
+
+    def __init__(self, session: requests.Session, printer: PrinterHandle, api_base: str) -> None:
+        self._session = session
+        self._printer = printer
+        self._api_base = api_base
+        self._print_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="print")
+        self._ack_executor = ThreadPoolExecutor(max_workers=ACK_WORKERS, thread_name_prefix="ack")
+        self._in_flight: set[str] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job: dict) -> None:
+        job_id = str(job["id"])
+        with self._lock:
+            if job_id in self._in_flight:
+                return
+            self._in_flight.add(job_id)
+        self._print_executor.submit(self._print, job)
+
+    def _print(self, job: dict) -> None:
+        try:
+            LOGGER.info("Imprimiendo trabajo %s", job["id"])
+            self._printer.print_raw(job["payload_zpl"])
+            ack = {"status": "sent"}
+        except Exception as exc:  # pragma: no cover - manejo básico
+            LOGGER.exception("Error imprimiendo %s", job["id"])
+            ack = {"status": "error", "error": str(exc)}
+        future = self._ack_executor.submit(self._ack, job["id"], ack)
+        future.add_done_callback(lambda _f, job_id=str(job["id"]): self._done(job_id))
+
+    def _ack(self, job_id: str, ack: dict) -> None:
+        try:
+            self._session.post(f"{self._api_base}/print/jobs/{job_id}/ack", json=ack)
+        except Exception:  # pragma: no cover - logging
+            LOGGER.exception("Error confirmando trabajo %s", job_id)
+
+    def _done(self, job_id: str) -> None:
+        with self._lock:
+            self._in_flight.discard(job_id)
+
+    def shutdown(self) -> None:
+        self._print_executor.shutdown(wait=True)
+        self._ack_executor.shutdown(wait=True)
+
+
+def build_session() -> requests.Session:
+    """Sesión HTTP keep-alive (sondeo + ACKs) y sin reintentos ocultos."""
+    session = requests.Session()
+    session.headers["Connection"] = "keep-alive"
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1 + ACK_WORKERS, max_retries=Retry(total=0))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def error_backoff(interval: float, max_interval: float, attempt: int) -> float:
+    """Backoff exponencial con full jitter tras un error consultando la API."""
+    return random.uniform(0, min(max_interval, interval * 2 ** min(attempt, 16)))
 
 
 def run() -> None:
@@ -55,29 +159,49 @@ def run() -> None:
     api_base = config["api_base_url"].rstrip("/")
     printer_name = config.get("printer_name", "ZDesigner ZD888t")
     interval = int(config.get("poll_interval_s", 3))
+    max_interval = int(config.get("max_poll_interval_s", 60))
 
     LOGGER.info("Iniciando agente para %s", printer_name)
 
-    session = requests.Session()
+    session = build_session()
+    with PrinterHandle(printer_name) as printer:
+        dispatcher = JobDispatcher(session, printer, api_base)
+        try:
+            poll_forever(session, dispatcher, api_base, interval, max_interval)
+        finally:
+            dispatcher.shutdown()
+
+
+def poll_forever(
+    session: requests.Session,
+    dispatcher: JobDispatcher,
+    api_base: str,
+    interval: int,
+    max_interval: int,
+) -> None:
+    idle_wait = float(interval)
+    attempt = 0
     while True:
         try:
-            resp = session.get(f"{api_base}/print/jobs", params={"status": "queued", "limit": 25})
+            resp = session.get(
+                f"{api_base}/print/jobs",
+                params={"status": "queued", "limit": 25, "include_payload": "true"},
+            )
             resp.raise_for_status()
             jobs = resp.json()
-            for job in jobs:
-                try:
-                    LOGGER.info("Imprimiendo trabajo %s", job["id"])
-                    send_raw_to_printer(printer_name, job["payload_zpl"])
-                    session.post(f"{api_base}/print/jobs/{job['id']}/ack", json={"status": "sent"})
-                except Exception as exc:  # pragma: no cover - manejo básico
-                    LOGGER.exception("Error imprimiendo %s", job["id"])
-                    session.post(
-                        f"{api_base}/print/jobs/{job['id']}/ack",
-                        json={"status": "error", "error": str(exc)},
-                    )
         except Exception:  # pragma: no cover - logging
             LOGGER.exception("Error consultando trabajos")
-        time.sleep(interval)
+            wait = error_backoff(interval, max_interval, attempt)
+            attempt += 1
+        else:
+            attempt = 0
+            for job in jobs:
+                dispatcher.submit(job)
+            # Con trabajos se vuelve al intervalo base; en vacío se espacia el
+            # sondeo hasta max_interval.
+            idle_wait = float(interval) if jobs else min(max_interval, idle_wait * IDLE_BACKOFF_FACTOR)
+            wait = idle_wait
+        time.sleep(wait)
 
 
 if __name__ == "__main__":  # pragma: no cover
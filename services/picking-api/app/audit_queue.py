@@ -0,0 +1,102 @@
+"""Escritura diferida de registros de auditoría.
+
+Los handlers encolan los valores de columna de ``models.Audit`` con
+:func:`enqueue` y un task de fondo los inserta en lotes, fuera del camino
+crítico de la request. La auditoría queda eventualmente consistente: un
+registro puede aparecer hasta ``FLUSH_INTERVAL_S`` después de la respuesta,
+y lo que siga en cola si el proceso termina sin shutdown ordenado se pierde.
+"""
+
+import asyncio
+import logging
+from typing import Any
+
+from . import models
+from .deps import SessionLocal
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_BATCH = 500
+FLUSH_INTERVAL_S = 0.1
+
+QUEUE: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=10000)
+
+
+def enqueue(entry: dict[str, Any]) -> None:
+    """Encola un registro sin bloquear; si la cola está llena se descarta."""
+    try:
+        QUEUE.put_nowait(entry)
+    except asyncio.QueueFull:
+        LOGGER.error("Cola de auditoría llena; se descarta %s/%s", entry.get("entity"), entry.get("action"))
+
+
+async def drain(queue: asyncio.Queue, items: list, max_items: int, timeout: float) -> None:
+    """Llena ``items`` con lo disponible en ``queue``.
+
+    Espera sin límite el primer elemento y luego junta lo que llegue durante
+    ``timeout`` segundos, hasta ``max_items``: lo ya encolado se toma con
+    ``get_nowait`` y sólo se duerme en ``queue.get()`` hasta el próximo
+    elemento, sin sondear. Trabaja sobre la lista recibida para que el
+    llamador conserve lo ya extraído si el task se cancela.
+    """
+    items.append(await queue.get())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while len(items) < max_items:
+        try:
+            items.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(queue.get(), remaining))
+        except TimeoutError:
+            break
+
+
+async def _insert(entries: list[dict[str, Any]]) -> None:
+    async with SessionLocal() as session:
+        session.add_all([models.Audit(**entry) for entry in entries])
+        await session.commit()
+
+
+async def _write_batch(entries: list[dict[str, Any]]) -> None:
+    try:
+        await _insert(entries)
+    except Exception:
+        if len(entries) == 1:
+            LOGGER.exception("No se pudo escribir el registro de auditoría %s", entries[0])
+            return
+        # Un registro inválido no debe tirar el lote entero: se reintenta
+        # fila a fila y sólo se registran las que vuelvan a fallar.
+        LOGGER.warning("Falló el lote de %d registros de auditoría; se reintenta uno a uno", len(entries))
+        for entry in entries:
+            try:
+                await _insert([entry])
+            except Exception:
+                LOGGER.exception("No se pudo escribir el registro de auditoría %s", entry)
+
+
+async def run_writer() -> None:
+    """Loop del task de fondo; se detiene cancelándolo."""
+    batch: list[dict[str, Any]] = []
+    try:
+        while True:
+            await drain(QUEUE, batch, MAX_BATCH, FLUSH_INTERVAL_S)
+            await _write_batch(batch)
+            batch = []
+    finally:
+        if batch:
+            await _write_batch(batch)
+
+
+async def flush() -> None:
+    """Escribe todo lo pendiente en la cola; se usa al apagar la app."""
+    while not QUEUE.empty():
+        batch: list[dict[str, Any]] = []
+        while len(batch) < MAX_BATCH and not QUEUE.empty():
+            batch.append(QUEUE.get_nowait())
+        await _write_batch(batch)
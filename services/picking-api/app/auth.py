@@ -1,11 +1,15 @@
 import datetime as dt
+import hashlib
 import os
-from typing import Any, Optional
+import time
+import uuid
+from typing import Any, NamedTuple, Optional
 
-import bcrypt
+import jwt
+from cachetools import TLRUCache, TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jwt import InvalidTokenError as JWTError
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from sqlalchemy import select
@@ -14,11 +18,52 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
 from .deps import get_session
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2id para hashes nuevos; los bcrypt existentes siguen validando y se
+# rehashean en el siguiente login exitoso.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated="auto",
+    argon2__rounds=3,
+    argon2__memory_cost=65536,
+    argon2__parallelism=4,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 JWT_SECRET = os.getenv("API_JWT_SECRET", "changeme")
 JWT_EXP_HOURS = int(os.getenv("API_JWT_EXP_HOURS", "8"))
+TOKEN_CACHE_TTL_S = 30
+USER_CACHE_TTL_S = 60
+_JWT_ALGORITHMS = ["HS256"]
+_DECODE_OPTS = {"require": ["exp", "sub", "role"], "verify_aud": False}
+
+
+def _token_ttu(_key: bytes, payload: dict[str, Any], now: float) -> float:
+    # Nunca mantener en caché un token más allá de su propia expiración.
+    return min(now + TOKEN_CACHE_TTL_S, float(payload.get("exp", now)))
+
+
+# Payloads JWT ya verificados, indexados por el SHA-256 del token. Solo se
+# accede desde el event loop, por lo que no requiere locking.
+_token_cache: TLRUCache[bytes, dict[str, Any]] = TLRUCache(maxsize=10000, ttu=_token_ttu, timer=time.time)
+
+
+class UserSnapshot(NamedTuple):
+    """Vista inmutable de ``models.User`` con los campos que usan los routers."""
+
+    id: uuid.UUID
+    username: str
+    role: str
+    active: bool
+    role_level: int
+
+
+_user_cache: TTLCache[str, UserSnapshot] = TTLCache(maxsize=5000, ttl=USER_CACHE_TTL_S)
+
+
+def invalidate_user(user_id: uuid.UUID | str) -> None:
+    """Descarta el snapshot cacheado; llamar al cambiar rol, clave o estado."""
+    _user_cache.pop(str(user_id), None)
 
 
 class TokenData(BaseModel):
@@ -27,17 +72,16 @@ class TokenData(BaseModel):
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    # passlib despacha por el prefijo del hash ($argon2id$ / $2b$).
     try:
         return pwd_context.verify(plain_password, hashed_password)
     except ValueError:
-        # bcrypt>=4 raises ValueError when passlib performs its wraparound
-        # detection with long passwords. Fallback to the bcrypt module so we
-        # can still authenticate seeded users even if the environment ships
-        # with the newer backend.
-        try:
-            return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
-        except ValueError:
-            return False
+        # Hash con formato desconocido o corrupto.
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -46,29 +90,46 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict[str, Any], expires_delta: Optional[dt.timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = dt.datetime.utcnow() + (expires_delta or dt.timedelta(hours=JWT_EXP_HOURS))
-    to_encode.update({"exp": expire})
+    lifetime_s = int(expires_delta.total_seconds()) if expires_delta is not None else JWT_EXP_HOURS * 3600
+    # "exp" según el RFC 7519 es un NumericDate: segundos enteros desde epoch.
+    to_encode["exp"] = int(time.time()) + lifetime_s
     return jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)
-) -> models.User:
+) -> UserSnapshot:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        user_id: str | None = payload.get("sub")
-        role: str | None = payload.get("role")
-        if user_id is None or role is None:
-            raise credentials_exception
-    except JWTError as exc:  # pragma: no cover - defensive
-        raise credentials_exception from exc
-    result = await session.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalar_one_or_none()
-    if user is None:
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _token_cache.get(cache_key)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=_JWT_ALGORITHMS, options=_DECODE_OPTS)
+        except JWTError as exc:  # pragma: no cover - defensive
+            raise credentials_exception from exc
+        _token_cache[cache_key] = payload
+    user_id: str | None = payload.get("sub")
+    role: str | None = payload.get("role")
+    if user_id is None or role is None:
         raise credentials_exception
+    user = _user_cache.get(user_id)
+    if user is None:
+        result = await session.execute(
+            select(
+                models.User.id,
+                models.User.username,
+                models.User.role,
+                models.User.active,
+                models.User.role_level,
+            ).where(models.User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            raise credentials_exception
+        user = UserSnapshot(*row)
+        _user_cache[user_id] = user
     return user
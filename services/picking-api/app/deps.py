@@ -1,6 +1,7 @@
 from collections.abc import AsyncGenerator
 import os
 
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 DATABASE_URL = (
@@ -10,10 +11,29 @@ DATABASE_URL = (
     f"{os.getenv('PGDATABASE','picking')}"
 )
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=False)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=int(os.getenv("PG_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("PG_MAX_OVERFLOW", "10")),
+    pool_recycle=int(os.getenv("PG_POOL_RECYCLE_S", "1800")),
+    pool_pre_ping=True,
+    # Columnas JSONB (audit.payload_json) serializadas con orjson.
+    json_serializer=lambda value: orjson.dumps(value).decode(),
+    # Caché de sentencias preparadas por conexión: la del dialecto de
+    # SQLAlchemy y la propia de asyncpg.
+    connect_args={
+        "prepared_statement_cache_size": int(os.getenv("PG_STATEMENT_CACHE_SIZE", "512")),
+        "statement_cache_size": int(os.getenv("PG_STATEMENT_CACHE_SIZE", "512")),
+    },
+)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    # FastAPI cachea la dependencia por request, así que todas las
+    # dependencias anidadas comparten esta misma sesión/conexión. Los
+    # handlers la cierran tras su última consulta para devolver la conexión
+    # al pool antes de serializar; cerrarla de nuevo aquí es inocuo.
     async with SessionLocal() as session:
         yield session
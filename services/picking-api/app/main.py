@@ -1,8 +1,33 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI
 
+from . import audit_queue
 from .routers import auth, import_abcxyz, doc_scan, moves, printing, stock, audit
 
-app = FastAPI(title="Picking API", version="0.1.0")
+
+@contextlib.asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    audit_writer = asyncio.create_task(audit_queue.run_writer())
+    ack_writer = printing.ack_batcher.start()
+    try:
+        yield
+    finally:
+        for task in (ack_writer, audit_writer):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await printing.ack_batcher.flush()
+        await audit_queue.flush()
+
+
+app = FastAPI(
+    title="Picking API",
+    version="0.1.0",
+    lifespan=lifespan,
+)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(import_abcxyz.router, prefix="/import/abcxyz", tags=["abcxyz"])
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, CheckConstraint, Column, Date, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Boolean, CheckConstraint, Column, Computed, Date, DateTime, ForeignKey, Index, Integer, Numeric, SmallInteger, String, Text, func
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -17,6 +17,11 @@ class User(Base):
     username: Mapped[str] = mapped_column(Text, unique=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(Text, nullable=False)
     role: Mapped[str] = mapped_column(Text, nullable=False)
+    # Columna generada por Postgres; debe coincidir con rbac.ROLE_HIERARCHY.
+    role_level: Mapped[int] = mapped_column(
+        SmallInteger,
+        Computed("CASE role WHEN 'admin' THEN 2 WHEN 'supervisor' THEN 1 ELSE 0 END", persisted=True),
+    )
     active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
 
@@ -52,11 +57,16 @@ class Product(Base):
 
 class Stock(Base):
     __tablename__ = "stock"
+    # lot/serial usan "" en vez de NULL para que la clave única sea de
+    # columnas planas (igualdad simple, sin expresiones coalesce).
+    __table_args__ = (
+        Index("ux_stock_item_lot_serial_location", "item_code", "lot", "serial", "location", unique=True),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     item_code: Mapped[str] = mapped_column(ForeignKey("products.item_code"), nullable=False)
-    lot: Mapped[str | None] = mapped_column(Text, nullable=True)
-    serial: Mapped[str | None] = mapped_column(Text, nullable=True)
+    lot: Mapped[str] = mapped_column(Text, nullable=False, default="", server_default="")
+    serial: Mapped[str] = mapped_column(Text, nullable=False, default="", server_default="")
     expiry: Mapped[datetime | None] = mapped_column(Date, nullable=True)
     location: Mapped[str] = mapped_column(Text, nullable=False, default="MAIN")
     qty: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -75,7 +85,12 @@ class Move(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
 
-    lines: Mapped[list["MoveLine"]] = relationship("MoveLine", back_populates="move", cascade="all, delete-orphan")
+    # selectin por defecto: cualquier consulta de movimientos sin opciones
+    # explícitas carga las líneas en un único SELECT ... IN, sin lazy loads
+    # (que además fallan bajo AsyncSession).
+    lines: Mapped[list["MoveLine"]] = relationship(
+        "MoveLine", back_populates="move", cascade="all, delete-orphan", lazy="selectin"
+    )
 
 
 class MoveLine(Base):
@@ -97,6 +112,7 @@ class MoveLine(Base):
 
 class Audit(Base):
     __tablename__ = "audit"
+    __table_args__ = (Index("ix_audit_ts", "ts"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     entity: Mapped[str] = mapped_column(Text, nullable=False)
@@ -104,11 +120,13 @@ class Audit(Base):
     action: Mapped[str] = mapped_column(Text, nullable=False)
     payload_json: Mapped[dict] = mapped_column(JSONB, nullable=False)
     user_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id"), nullable=True)
-    ts: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    ts: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
 
 
 class PrintJob(Base):
     __tablename__ = "print_jobs"
+    # get_jobs: WHERE status = ? ORDER BY created_at LIMIT n sale del índice.
+    __table_args__ = (Index("ix_print_jobs_status_created_at", "status", "created_at"),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     printer_name: Mapped[str] = mapped_column(Text, nullable=False)
@@ -1,6 +1,6 @@
 from fastapi import HTTPException, status
 
-from .models import User
+from .auth import UserSnapshot
 
 ROLE_HIERARCHY = {
     "operator": 0,
@@ -8,11 +8,11 @@ ROLE_HIERARCHY = {
     "admin": 2,
 }
 
-
-def require_role(user: User, role: str) -> None:
+def require_role(user: UserSnapshot, role: str) -> None:
+    # El nivel del usuario ya viene resuelto en User.role_level, así que cada
+    # chequeo es una sola comparación entera.
     required = ROLE_HIERARCHY.get(role)
-    current = ROLE_HIERARCHY.get(user.role)
     if required is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Rol requerido inválido")
-    if current is None or current < required:
+    if user.role_level < required:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
@@ -1,8 +1,45 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..auth import get_current_user
+from ..deps import get_session
+from ..rbac import require_role
 
 router = APIRouter()
 
+_AUDIT_ADAPTER = TypeAdapter(list[schemas.AuditEntry])
+
 
-@router.get("")
-async def list_audit() -> list[dict[str, str]]:  # pragma: no cover - placeholder
-    return []
+@router.get("", response_model=list[schemas.AuditEntry], response_model_exclude_none=True)
+async def list_audit(
+    entity: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+) -> Response:
+    require_role(user, "supervisor")
+    # Columnas explícitas: filas planas sin hidratar instancias ORM.
+    stmt = (
+        select(
+            models.Audit.id,
+            models.Audit.entity,
+            models.Audit.entity_id,
+            models.Audit.action,
+            models.Audit.payload_json,
+            models.Audit.user_id,
+            models.Audit.ts,
+        )
+        .order_by(models.Audit.ts.desc())
+        .limit(limit)
+    )
+    if entity is not None:
+        stmt = stmt.where(models.Audit.entity == entity)
+    rows = (await session.execute(stmt)).mappings().all()
+    await session.close()
+    # Mismo JSON que response_model_exclude_none, armado en un paso por
+    # pydantic-core y sin pasar por jsonable_encoder.
+    content = _AUDIT_ADAPTER.dump_json(_AUDIT_ADAPTER.validate_python(rows), exclude_none=True)
+    return Response(content=content, media_type="application/json")
@@ -1,45 +1,60 @@
-import datetime as dt
+import secrets
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .. import audit_queue
 from .. import auth as auth_utils
 from .. import models, schemas
 from ..deps import get_session
 
 router = APIRouter()
 
+# Hash de referencia para verificar contra algo cuando el usuario no existe,
+# de modo que ambos casos cuesten lo mismo y no se filtre por tiempo. Debe
+# tener el esquema y costo de los hashes guardados: mientras queden usuarios
+# bcrypt-12 sin migrar a argon2 (p. ej. el admin de db/init.sql), el dummy
+# se mantiene en bcrypt-12.
+_DUMMY_HASH = auth_utils.pwd_context.handler("bcrypt").using(rounds=12).hash(secrets.token_urlsafe(16))
 
-async def _register_login_attempt(
-    session: AsyncSession,
+# Construida una sola vez; su forma compilada se reutiliza en cada login.
+_LOGIN_STMT = select(models.User).where(models.User.username == bindparam("username"))
+
+
+def _register_login_attempt(
     *,
     username: str,
     success: bool,
     user_id: uuid.UUID | None,
     detail: str | None = None,
 ) -> None:
-    session.add(
-        models.Audit(
-            entity="auth",
-            entity_id=username,
-            action="login_success" if success else "login_failed",
-            payload_json={"username": username, "success": success, "detail": detail},
-            user_id=user_id,
-            ts=dt.datetime.utcnow(),
-        )
+    audit_queue.enqueue(
+        {
+            "entity": "auth",
+            "entity_id": username,
+            "action": "login_success" if success else "login_failed",
+            "payload_json": {"username": username, "success": success, "detail": detail},
+            "user_id": user_id,
+        }
     )
-    await session.commit()
+
+
+async def _authenticate_user(session: AsyncSession, username: str, password: str) -> models.User | None:
+    result = await session.execute(_LOGIN_STMT, {"username": username})
+    user = result.scalar_one_or_none()
+    # Siempre se verifica un hash, exista o no el usuario.
+    ok = auth_utils.verify_password(password, user.password_hash if user is not None else _DUMMY_HASH)
+    valid = int(user is not None) & int(ok)
+    return user if valid else None
 
 
 @router.post("/login", response_model=schemas.Token)
 async def login(payload: schemas.LoginRequest, session: AsyncSession = Depends(get_session)) -> schemas.Token:
-    result = await session.execute(select(models.User).where(models.User.username == payload.username))
-    user = result.scalar_one_or_none()
-    if user is None or not auth_utils.verify_password(payload.password, user.password_hash):
-        await _register_login_attempt(
-            session,
+    user = await _authenticate_user(session, payload.username, payload.password)
+    if user is None:
+        _register_login_attempt(
             username=payload.username,
             success=False,
             user_id=None,
@@ -47,17 +62,24 @@ async def login(payload: schemas.LoginRequest, session: AsyncSession = Depends(g
         )
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
     if not user.active:
-        await _register_login_attempt(
-            session,
+        _register_login_attempt(
             username=payload.username,
             success=False,
             user_id=user.id,
             detail="Usuario inactivo",
         )
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario inactivo")
-    token = auth_utils.create_access_token({"sub": str(user.id), "role": user.role})
-    await _register_login_attempt(
-        session,
+    if auth_utils.password_needs_rehash(user.password_hash):
+        # Migra hashes bcrypt heredados a argon2id.
+        user.password_hash = auth_utils.get_password_hash(payload.password)
+        await session.commit()
+    # El login refresca el snapshot cacheado (p. ej. tras un cambio de rol).
+    auth_utils.invalidate_user(user.id)
+    # preferred_username lo muestra la UI sin otra cookie ni consulta.
+    token = auth_utils.create_access_token(
+        {"sub": str(user.id), "role": user.role, "preferred_username": user.username}
+    )
+    _register_login_attempt(
         username=payload.username,
         success=True,
         user_id=user.id,
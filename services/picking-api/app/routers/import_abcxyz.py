@@ -1,9 +1,11 @@
+import datetime as dt
 import os
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Any
 
-import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import insert
+from openpyxl import load_workbook
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -15,6 +17,83 @@ from ..rbac import require_role
 router = APIRouter()
 
 ABCXYZ_FILE = "abcxyz_results.xlsx"
+# Filas por sentencia INSERT; mantiene cada lote bajo el límite de 32767
+# parámetros de asyncpg (19 columnas x 1000 filas).
+UPSERT_CHUNK_SIZE = 1000
+
+PRODUCT_FIELDS = (
+    "item_code",
+    "item_name",
+    "monthly_mean",
+    "monthly_std",
+    "annual_qty",
+    "ABC",
+    "XYZ",
+    "unit_cost",
+    "ACV",
+    "z_level",
+    "lead_time_days",
+    "SS",
+    "ROP",
+    "EOQ",
+    "SMIN",
+    "SMAX",
+    "OnHand",
+    "BelowROP",
+)
+
+# Atributo ORM -> nombre de columna (p. ej. "ABC" -> "abc"). El INSERT va
+# contra la tabla y ``excluded`` se indexa por nombre de columna.
+_PRODUCT_COLUMNS = {attr.key: attr.columns[0].name for attr in models.Product.__mapper__.column_attrs}
+
+
+async def _upsert_products(session: AsyncSession, rows: list[dict[str, Any]]) -> int:
+    """Inserta/actualiza productos con un INSERT multi-fila por lote."""
+    now = dt.datetime.utcnow()
+    # Un mismo item_code no puede aparecer dos veces en un ON CONFLICT DO
+    # UPDATE; como en el upsert fila a fila, gana la última ocurrencia.
+    unique_rows = list({row["item_code"]: row for row in rows}.values())
+    for start in range(0, len(unique_rows), UPSERT_CHUNK_SIZE):
+        chunk = [
+            {_PRODUCT_COLUMNS[key]: value for key, value in row.items()} | {"updated_at": now}
+            for row in unique_rows[start : start + UPSERT_CHUNK_SIZE]
+        ]
+        stmt = pg_insert(models.Product.__table__).values(chunk)
+        update_cols = {name: stmt.excluded[name] for name in chunk[0] if name != "item_code"}
+        stmt = stmt.on_conflict_do_update(index_elements=["item_code"], set_=update_cols)
+        await session.execute(stmt)
+    return len(rows)
+
+
+def _iter_sheet_rows(file_path: Path) -> Iterator[dict[str, Any]]:
+    """Lee la hoja activa fila a fila sin materializarla completa en memoria.
+
+    Las filas vienen del archivo generado por el análisis ABC-XYZ y van
+    directo al upsert, así que se arman como dicts planos sin pasar por
+    Pydantic.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        # Posición de cada campo resuelta una sola vez desde el encabezado.
+        index = {name: pos for pos, name in enumerate(headers)}
+        code_pos = index.get("item_code")
+        name_pos = index.get("item_name")
+        if code_pos is None or name_pos is None:
+            return
+        positions = [(field, index.get(field)) for field in PRODUCT_FIELDS]
+        width = len(headers)
+        for values in rows:
+            if len(values) < width:
+                values = values + (None,) * (width - len(values))
+            if not values[code_pos] or not values[name_pos]:
+                continue
+            yield {field: 0 if pos is None or (v := values[pos]) is None else v for field, pos in positions}
+    finally:
+        workbook.close()
 
 
 @router.get("/probe", response_model=schemas.ProbeResponse)
@@ -35,34 +114,14 @@ async def import_from_local(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
 
-    df = pd.read_excel(file_path)
-    df = df.fillna(0)
     count = 0
-    for record in df.to_dict(orient="records"):
-        payload = {k: record.get(k, 0) for k in (
-            "item_code",
-            "item_name",
-            "monthly_mean",
-            "monthly_std",
-            "annual_qty",
-            "ABC",
-            "XYZ",
-            "unit_cost",
-            "ACV",
-            "z_level",
-            "lead_time_days",
-            "SS",
-            "ROP",
-            "EOQ",
-            "SMIN",
-            "SMAX",
-            "OnHand",
-            "BelowROP",
-        )}
-        stmt = pg_insert(models.Product).values(**payload)
-        update_cols = {c: stmt.excluded[c] for c in payload if c not in {"item_code"}}
-        stmt = stmt.on_conflict_do_update(index_elements=[models.Product.item_code], set_=update_cols)
-        await session.execute(stmt)
-        count += 1
+    chunk: list[dict[str, Any]] = []
+    for row in _iter_sheet_rows(file_path):
+        chunk.append(row)
+        if len(chunk) >= UPSERT_CHUNK_SIZE:
+            count += await _upsert_products(session, chunk)
+            chunk = []
+    if chunk:
+        count += await _upsert_products(session, chunk)
     await session.commit()
     return schemas.ProductImportResult(imported=count)
@@ -1,17 +1,23 @@
 """Routers for move operations covering PO/SO/TR/RT flows."""
 
 import datetime as dt
+import uuid
 from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
-from .. import models, schemas
+from .. import audit_queue, models, schemas
 from ..auth import get_current_user
 from ..deps import get_session
 from ..rbac import require_role
+from .stock import invalidate_stock_cache
 
 router = APIRouter()
 
@@ -24,52 +30,117 @@ MOVE_TYPE_MAPPING: dict[str, tuple[str, Literal[1, -1]]] = {
 }
 
 
-def _resolve_move_type(doc_type: str) -> tuple[str, int]:
+_CONFIRM_ADAPTER = TypeAdapter(schemas.MoveConfirmRequest)
+
+
+def _inline_json_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """JSON Schema del modelo con los ``$defs`` resueltos en línea.
+
+    Los modelos de un body leído a mano no pasan a ``components``, así que
+    el schema de ``openapi_extra`` no puede apuntar a ``$defs`` externos.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref is not None:
+                return resolve(defs[ref.rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+# El body se lee en ``_parse_confirm_payload``; esto lo sigue documentando.
+_CONFIRM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _inline_json_schema(schemas.MoveConfirmRequest)}},
+    }
+}
+
+
+async def _parse_confirm_payload(request: Request) -> schemas.MoveConfirmRequest:
+    # pydantic-core parsea y valida el JSON en un solo paso, sin pasar por
+    # json.loads; los errores conservan el formato 422 de FastAPI.
     try:
-        return MOVE_TYPE_MAPPING[doc_type]
-    except KeyError as exc:  # pragma: no cover - defensive
-        raise HTTPException(status_code=400, detail="Tipo de documento inválido") from exc
+        return _CONFIRM_ADAPTER.validate_json(await request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        ) from exc
+
+
+def _resolve_move_type(doc_type: str) -> tuple[str, int]:
+    pair = MOVE_TYPE_MAPPING.get(doc_type)
+    if pair is None:  # pragma: no cover - defensive
+        raise HTTPException(status_code=400, detail="Tipo de documento inválido")
+    return pair
+
+
+def _utcnow() -> dt.datetime:
+    # Las columnas son TIMESTAMP sin zona: se guarda UTC naive, como el
+    # default de los modelos, sin pasar por el deprecado utcnow().
+    return dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+
+async def _ensure_products(session: AsyncSession, item_codes: list[str]) -> None:
+    """Traduce a 404 el primer producto inexistente.
+
+    Sólo se usa en los caminos de error: en el camino feliz la existencia la
+    garantizan las FK de ``stock`` y ``move_lines`` a ``products``.
+    """
+    codes = set(item_codes)
+    result = await session.execute(select(models.Product.item_code).where(models.Product.item_code.in_(codes)))
+    missing = codes.difference(result.scalars().all())
+    if missing:
+        # Se informa el primero en el orden recibido, como el chequeo por línea.
+        first_missing = next(code for code in item_codes if code in missing)
+        raise HTTPException(status_code=404, detail=f"Producto {first_missing} no existe")
+
+
+# foreign_key_violation y los nombres por defecto que Postgres da a las FK
+# item_code -> products de db/init.sql.
+_FK_VIOLATION = "23503"
+_PRODUCT_FKEYS = frozenset({"stock_item_code_fkey", "move_lines_item_code_fkey"})
 
 
-async def _ensure_product(session: AsyncSession, item_code: str) -> None:
-    result = await session.execute(select(models.Product).where(models.Product.item_code == item_code))
-    if result.scalar_one_or_none() is None:
-        raise HTTPException(status_code=404, detail=f"Producto {item_code} no existe")
+def _is_missing_product(exc: IntegrityError) -> bool:
+    orig = exc.orig
+    if getattr(orig, "sqlstate", None) != _FK_VIOLATION:
+        return False
+    # El adaptador de asyncpg encadena la excepción original, que trae el
+    # nombre de la restricción.
+    constraint = getattr(orig, "constraint_name", None) or getattr(orig.__cause__, "constraint_name", None)
+    return constraint in _PRODUCT_FKEYS
+
+
+async def _raise_for_missing_products(session: AsyncSession, exc: IntegrityError, item_codes: list[str]) -> None:
+    """Convierte en 404 una violación de la FK a ``products``."""
+    await session.rollback()
+    if _is_missing_product(exc):
+        await _ensure_products(session, item_codes)
 
 
 async def _get_move(session: AsyncSession, move_id: str) -> models.Move:
     result = await session.execute(
         select(models.Move)
         .where(models.Move.id == move_id)
-        .options(selectinload(models.Move.lines))
+        .options(joinedload(models.Move.lines))
     )
-    move = result.scalar_one_or_none()
+    # Con joinedload sobre una colección hay que deduplicar el movimiento padre.
+    move = result.unique().scalar_one_or_none()
     if move is None:
         raise HTTPException(status_code=404, detail="Movimiento no encontrado")
     return move
 
 
 def _build_move_response(move: models.Move) -> schemas.MoveResponse:
-    return schemas.MoveResponse(
-        id=move.id,
-        doc_type=move.doc_type,
-        doc_number=move.doc_number,
-        status=move.status,
-        type=move.type,
-        created_at=move.created_at,
-        updated_at=move.updated_at,
-        lines=[
-            schemas.MoveLineResponse(
-                id=line.id,
-                item_code=line.item_code,
-                qty=line.qty,
-                qty_confirmed=line.qty_confirmed,
-                location_from=line.location_from,
-                location_to=line.location_to,
-            )
-            for line in move.lines
-        ],
-    )
+    return schemas.MoveResponse.model_validate(move)
 
 
 @router.post("/", response_model=schemas.MoveResponse, status_code=status.HTTP_201_CREATED)
@@ -80,30 +151,40 @@ async def create_move(
 ) -> schemas.MoveResponse:
     require_role(user, "operator")
     move_type, _ = _resolve_move_type(payload.doc_type)
+    now = _utcnow()
+    # El id se fija aquí: el default uuid4 recién se aplica en el flush y la
+    # auditoría lo necesita antes.
     move = models.Move(
+        id=uuid.uuid4(),
         type=move_type,
         doc_type=payload.doc_type,
         doc_number=payload.doc_number,
         status="pending",
         created_by=user.id,
-        updated_at=dt.datetime.utcnow(),
+        created_at=now,
+        updated_at=now,
+        # Colección inicializada: la respuesta no dispara un lazy load.
+        lines=[],
     )
     session.add(move)
-    session.add(
-        models.Audit(
-            entity="move",
-            entity_id=str(move.id),
-            action="created",
-            payload_json={
+    # Todos los campos de la respuesta se fijaron en Python; no hace falta
+    # releer la fila tras el commit.
+    await session.commit()
+    await session.close()
+    # La auditoría se escribe en segundo plano, ya confirmado el movimiento.
+    audit_queue.enqueue(
+        {
+            "entity": "move",
+            "entity_id": str(move.id),
+            "action": "created",
+            "payload_json": {
                 "doc_type": payload.doc_type,
                 "doc_number": payload.doc_number,
                 "user_id": str(user.id),
             },
-            user_id=user.id,
-        )
+            "user_id": user.id,
+        }
     )
-    await session.commit()
-    await session.refresh(move)
     return _build_move_response(move)
 
 
@@ -115,17 +196,21 @@ async def get_move(
 ) -> schemas.MoveResponse:
     require_role(user, "operator")
     move = await _get_move(session, move_id)
+    await session.close()
     return _build_move_response(move)
 
 
-@router.post("/{move_id}/confirm", response_model=schemas.MoveResponse)
+@router.post("/{move_id}/confirm", response_model=schemas.MoveResponse, openapi_extra=_CONFIRM_OPENAPI)
 async def confirm_move(
     move_id: str,
-    payload: schemas.MoveConfirmRequest,
-    session: AsyncSession = Depends(get_session),
+    # Las dependencias se resuelven en orden: primero la autenticación, y
+    # sólo con un token válido se lee y valida el body.
     user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    payload: schemas.MoveConfirmRequest = Depends(_parse_confirm_payload),
 ) -> schemas.MoveResponse:
     require_role(user, "operator")
+    now = _utcnow()
     move = await _get_move(session, move_id)
     if move.status == "approved":
         raise HTTPException(status_code=400, detail="El movimiento ya fue aprobado")
@@ -138,36 +223,46 @@ async def confirm_move(
 
     confirmed_all = True
     audit_lines: list[dict[str, Any]] = []
+    new_lines: list[models.MoveLine] = []
+    inbound_qty: dict[tuple[str, str, str, str], int] = {}
     for line_payload in payload.lines:
-        await _ensure_product(session, line_payload.item_code)
         qty_confirmed = line_payload.qty_confirmed if line_payload.qty_confirmed is not None else line_payload.qty
         if qty_confirmed > line_payload.qty:
             raise HTTPException(status_code=400, detail="La cantidad confirmada no puede superar la cantidad solicitada")
         if qty_confirmed < line_payload.qty:
             confirmed_all = False
 
-        target_location = line_payload.location_to if direction > 0 else line_payload.location_from
-        stock_query = select(models.Stock).where(
-            models.Stock.item_code == line_payload.item_code,
-            models.Stock.location == target_location,
-        )
-        result = await session.execute(stock_query)
-        stock = result.scalar_one_or_none()
-
         if direction > 0:
-            if stock is None:
-                stock = models.Stock(item_code=line_payload.item_code, qty=0, location=target_location)
-                session.add(stock)
-            stock.qty += qty_confirmed
+            stock_key = (line_payload.item_code, line_payload.lot, line_payload.serial, line_payload.location_to)
+            inbound_qty[stock_key] = inbound_qty.get(stock_key, 0) + qty_confirmed
         else:
-            if stock is None or stock.qty < qty_confirmed:
+            # El chequeo de saldo va en el predicado: atómico frente a
+            # confirmaciones concurrentes y sin SELECT previo. La clave única
+            # incluye lote y serie, así que se descuenta exactamente la fila
+            # que indica la línea (sin lote/serie: la fila con "").
+            remaining = await session.scalar(
+                update(models.Stock)
+                .where(
+                    models.Stock.item_code == line_payload.item_code,
+                    models.Stock.location == line_payload.location_from,
+                    models.Stock.lot == line_payload.lot,
+                    models.Stock.serial == line_payload.serial,
+                    models.Stock.qty >= qty_confirmed,
+                )
+                .values(qty=models.Stock.qty - qty_confirmed)
+                .returning(models.Stock.qty)
+                .execution_options(synchronize_session=False)
+            )
+            if remaining is None:
+                # Sin fila que descontar puede tratarse de un producto inexistente.
+                await _ensure_products(session, [line.item_code for line in payload.lines])
                 raise HTTPException(status_code=400, detail=f"Stock insuficiente para {line_payload.item_code}")
-            stock.qty -= qty_confirmed
 
-        session.add(
+        new_lines.append(
             models.MoveLine(
-                move_id=move.id,
                 item_code=line_payload.item_code,
+                lot=line_payload.lot or None,
+                serial=line_payload.serial or None,
                 qty=line_payload.qty,
                 qty_confirmed=qty_confirmed,
                 location_from=line_payload.location_from,
@@ -181,26 +276,57 @@ async def confirm_move(
                 "qty_confirmed": qty_confirmed,
                 "location_from": line_payload.location_from,
                 "location_to": line_payload.location_to,
+                "lot": line_payload.lot,
+                "serial": line_payload.serial,
             }
         )
 
+    if inbound_qty:
+        # Un único upsert multi-fila sobre ux_stock_item_lot_serial_location;
+        # las claves van agregadas porque ON CONFLICT no admite tocar la misma
+        # fila dos veces en una sentencia.
+        upsert = pg_insert(models.Stock).values(
+            [
+                {"item_code": item_code, "lot": lot, "serial": serial, "location": location, "qty": qty}
+                for (item_code, lot, serial, location), qty in inbound_qty.items()
+            ]
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=["item_code", "lot", "serial", "location"],
+            set_={"qty": models.Stock.qty + upsert.excluded.qty},
+        )
+        try:
+            await session.execute(upsert)
+        except IntegrityError as exc:
+            await _raise_for_missing_products(session, exc, [line.item_code for line in payload.lines])
+            raise
+
+    # Se agregan de una vez a la colección ya cargada: el flush las inserta en
+    # un solo INSERT multi-fila (insertmanyvalues) y la respuesta no relee.
+    move.lines.extend(new_lines)
     move.type = move_type
     move.status = "approved" if confirmed_all else "pending"
-    move.updated_at = dt.datetime.utcnow()
-
-    session.add(
-        models.Audit(
-            entity="move",
-            entity_id=str(move.id),
-            action="confirmed",
-            payload_json={
+    move.updated_at = now
+
+    # expire_on_commit=False: los ids de las líneas (default uuid4) y el resto
+    # del estado siguen en memoria tras el commit.
+    try:
+        await session.commit()
+    except IntegrityError as exc:
+        await _raise_for_missing_products(session, exc, [line.item_code for line in payload.lines])
+        raise
+    await session.close()
+    invalidate_stock_cache()
+    audit_queue.enqueue(
+        {
+            "entity": "move",
+            "entity_id": str(move.id),
+            "action": "confirmed",
+            "payload_json": {
                 "lines": audit_lines,
                 "user_id": str(user.id),
             },
-            user_id=user.id,
-        )
+            "user_id": user.id,
+        }
     )
-
-    await session.commit()
-    refreshed = await _get_move(session, move_id)
-    return _build_move_response(refreshed)
+    return _build_move_response(move)
@@ -1,19 +1,33 @@
+import asyncio
 import datetime as dt
+import logging
 import os
+import uuid
+from typing import NamedTuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, update
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import case, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas, zpl
+from .. import audit_queue, models, schemas, zpl
 from ..auth import get_current_user
-from ..deps import get_session
+from ..deps import SessionLocal, get_session
 from ..rbac import require_role
 
+LOGGER = logging.getLogger(__name__)
+
 router = APIRouter()
 
 DEFAULT_PRINTER = os.getenv("PRINTER_NAME", "ZDesigner ZD888t")
 
+ACK_MAX_BATCH = 128
+ACK_FLUSH_INTERVAL_S = 0.05
+# Espera máxima de un ACK por su lote; el agente reintenta si vence.
+ACK_TIMEOUT_S = 5.0
+# Estados que cuentan como un intento fallido.
+_RETRY_STATUSES = frozenset({"error", "retry"})
+
 
 @router.post("/product", response_model=schemas.PrintJobResponse)
 async def enqueue_product_label(
@@ -36,69 +50,211 @@ async def enqueue_product_label(
         item_code=payload.item_code,
         item_name=item_name,
         fecha_ingreso=fecha.strftime("%d-%m-%Y"),
-    )
-    job = models.PrintJob(
-        printer_name=DEFAULT_PRINTER,
-        payload_zpl=zpl_payload,
         copies=payload.copies,
     )
-    session.add(job)
+    # Una sola fila por pedido: la etiqueta ya lleva ^PQ con las copias y el
+    # agente la envía una vez. Sólo se devuelven las columnas que asigna el
+    # INSERT; el resto ya se conoce aquí.
+    now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    stmt = (
+        insert(models.PrintJob)
+        .values(
+            printer_name=DEFAULT_PRINTER,
+            payload_zpl=zpl_payload,
+            copies=payload.copies,
+            created_at=now,
+            updated_at=now,
+        )
+        .returning(
+            models.PrintJob.id,
+            models.PrintJob.status,
+            models.PrintJob.attempts,
+            models.PrintJob.last_error,
+            models.PrintJob.created_at,
+        )
+    )
+    row = (await session.execute(stmt)).one()
     await session.commit()
-    await session.refresh(job)
-    return schemas.PrintJobResponse(
-        id=job.id,
-        printer_name=job.printer_name,
-        status=job.status,
-        copies=job.copies,
-        payload_zpl=job.payload_zpl,
-        attempts=job.attempts,
-        last_error=job.last_error,
-        created_at=job.created_at,
+    await session.close()
+    return schemas.PrintJobResponse.model_construct(
+        **row._mapping,
+        printer_name=DEFAULT_PRINTER,
+        copies=payload.copies,
+        payload_zpl=zpl_payload,
     )
 
 
-@router.get("/jobs")
+_JOBS_ADAPTER = TypeAdapter(list[schemas.PrintJobResponse])
+
+# Columnas del listado; payload_zpl (el TEXT más pesado) sólo si se pide.
+_JOB_LIST_COLUMNS = (
+    models.PrintJob.id,
+    models.PrintJob.printer_name,
+    models.PrintJob.status,
+    models.PrintJob.copies,
+    models.PrintJob.attempts,
+    models.PrintJob.last_error,
+    models.PrintJob.created_at,
+)
+
+
+@router.get("/jobs", response_model=list[schemas.PrintJobResponse])
 async def get_jobs(
     status: str = Query("queued"),
     limit: int = Query(25, ge=1, le=100),
+    include_payload: bool = Query(False),
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_user),
 ):
     require_role(user, "operator")
+    payload_column = models.PrintJob.payload_zpl if include_payload else literal("").label("payload_zpl")
     result = await session.execute(
-        select(models.PrintJob).where(models.PrintJob.status == status).order_by(models.PrintJob.created_at.asc()).limit(limit)
+        select(*_JOB_LIST_COLUMNS, payload_column)
+        .where(models.PrintJob.status == status)
+        .order_by(models.PrintJob.created_at.asc())
+        .limit(limit)
     )
-    jobs = result.scalars().all()
-    return [
-        schemas.PrintJobResponse(
-            id=j.id,
-            printer_name=j.printer_name,
-            status=j.status,
-            copies=j.copies,
-            payload_zpl=j.payload_zpl,
-            attempts=j.attempts,
-            last_error=j.last_error,
-            created_at=j.created_at,
+    # pydantic-core recorre y serializa la lista completa; se devuelve el JSON
+    # ya armado sin pasar por jsonable_encoder.
+    rows = result.mappings().all()
+    await session.close()
+    return Response(content=_JOBS_ADAPTER.dump_json(_JOBS_ADAPTER.validate_python(rows)), media_type="application/json")
+
+
+class _PendingAck(NamedTuple):
+    job_id: uuid.UUID
+    status: str
+    error: str | None
+    future: asyncio.Future
+
+
+def _split_duplicates(batch: list[_PendingAck]) -> tuple[dict[uuid.UUID, _PendingAck], list[_PendingAck]]:
+    """Separa la primera confirmación de cada trabajo de las repetidas.
+
+    Un ``CASE id WHEN ...`` sólo aplica la primera rama que coincide, así que
+    las repetidas pasan al lote siguiente para conservar el orden de llegada.
+    """
+    unique: dict[uuid.UUID, _PendingAck] = {}
+    carry: list[_PendingAck] = []
+    for ack in batch:
+        if ack.job_id in unique:
+            carry.append(ack)
+        else:
+            unique[ack.job_id] = ack
+    return unique, carry
+
+
+class AckBatcher:
+    """Agrupa los ACK del agente en un único UPDATE por tick.
+
+    Cada request encola su ACK y espera un future; el task de fondo junta
+    hasta ``ACK_MAX_BATCH`` entradas o ``ACK_FLUSH_INTERVAL_S`` segundos y
+    resuelve cada future con el estado final (``None`` si el trabajo no
+    existe).
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[_PendingAck] = asyncio.Queue()
+        self._writer: asyncio.Task | None = None
+
+    def start(self) -> asyncio.Task:
+        """Lanza ``run`` como task de fondo; lo cancela el lifespan."""
+        self._writer = asyncio.create_task(self.run())
+        self._writer.add_done_callback(self._on_writer_done)
+        return self._writer
+
+    def _on_writer_done(self, task: asyncio.Task) -> None:
+        # Cancelado es el apagado normal: ``flush`` resuelve lo que quede.
+        if task.cancelled() or task.exception() is None:
+            return
+        LOGGER.error("El writer de ACK terminó con error", exc_info=task.exception())
+        while not self._queue.empty():
+            ack = self._queue.get_nowait()
+            if not ack.future.done():
+                ack.future.set_exception(task.exception())
+
+    async def submit(self, job_id: uuid.UUID, status: str, error: str | None) -> str | None:
+        """Encola el ACK y espera su lote.
+
+        Levanta ``RuntimeError`` si el writer no está corriendo y
+        ``TimeoutError`` si el lote no se resuelve en ``ACK_TIMEOUT_S``.
+        """
+        if self._writer is None or self._writer.done():
+            raise RuntimeError("El writer de ACK no está corriendo")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_PendingAck(job_id, status, error, future))
+        return await asyncio.wait_for(future, ACK_TIMEOUT_S)
+
+    async def _write(self, batch: list[_PendingAck]) -> list[_PendingAck]:
+        pending, carry = _split_duplicates(batch)
+        job_id = models.PrintJob.id
+        stmt = (
+            update(models.PrintJob)
+            .where(job_id.in_(list(pending)))
+            .values(
+                status=case({ack.job_id: literal(ack.status) for ack in pending.values()}, value=job_id),
+                last_error=case(
+                    {ack.job_id: literal(ack.error, models.PrintJob.last_error.type) for ack in pending.values()},
+                    value=job_id,
+                ),
+                attempts=models.PrintJob.attempts
+                + case({ack.job_id: int(ack.status in _RETRY_STATUSES) for ack in pending.values()}, value=job_id),
+                updated_at=dt.datetime.now(dt.timezone.utc).replace(tzinfo=None),
+            )
+            .returning(job_id, models.PrintJob.status)
+            .execution_options(synchronize_session=False)
         )
-        for j in jobs
-    ]
+        try:
+            async with SessionLocal() as session:
+                updated = dict((await session.execute(stmt)).all())
+                await session.commit()
+        except Exception as exc:  # pragma: no cover - depende de la base de datos
+            LOGGER.exception("No se pudieron confirmar %d trabajos de impresión", len(pending))
+            for ack in pending.values():
+                if not ack.future.done():
+                    ack.future.set_exception(exc)
+        else:
+            for ack in pending.values():
+                if not ack.future.done():
+                    ack.future.set_result(updated.get(ack.job_id))
+        return carry
+
+    async def run(self) -> None:
+        """Loop del task de fondo; se detiene cancelándolo."""
+        batch: list[_PendingAck] = []
+        try:
+            while True:
+                if not batch:
+                    await audit_queue.drain(self._queue, batch, ACK_MAX_BATCH, ACK_FLUSH_INTERVAL_S)
+                batch = await self._write(batch)
+        finally:
+            while batch:
+                batch = await self._write(batch)
+
+    async def flush(self) -> None:
+        """Resuelve lo que quede en cola; se usa al apagar la app."""
+        while not self._queue.empty():
+            batch: list[_PendingAck] = []
+            while len(batch) < ACK_MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            while batch:
+                batch = await self._write(batch)
+
+
+ack_batcher = AckBatcher()
 
 
 @router.post("/jobs/{job_id}/ack")
 async def ack_job(
-    job_id: str,
+    job_id: uuid.UUID,
     payload: schemas.PrintAckRequest,
-    session: AsyncSession = Depends(get_session),
     user=Depends(get_current_user),
 ):
     require_role(user, "operator")
-    result = await session.execute(select(models.PrintJob).where(models.PrintJob.id == job_id))
-    job = result.scalar_one_or_none()
-    if job is None:
+    try:
+        new_status = await ack_batcher.submit(job_id, payload.status, payload.error)
+    except (RuntimeError, TimeoutError) as exc:
+        raise HTTPException(status_code=503, detail="Confirmación no disponible, reintenta") from exc
+    if new_status is None:
         raise HTTPException(status_code=404, detail="Trabajo no encontrado")
-    job.status = payload.status
-    job.last_error = payload.error
-    job.attempts = job.attempts + 1 if payload.status in {"error", "retry"} else job.attempts
-    job.updated_at = dt.datetime.utcnow()
-    await session.commit()
-    return {"status": job.status}
+    return {"status": new_status}
@@ -1,8 +1,56 @@
-from fastapi import APIRouter
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..auth import get_current_user
+from ..deps import get_session
+from ..rbac import require_role
 
 router = APIRouter()
 
+STOCK_CACHE_TTL_S = 15
+
+_STOCK_ADAPTER = TypeAdapter(list[schemas.StockEntry])
+
+# JSON ya serializado por ``limit``: no depende del usuario. Caché por
+# proceso; con varios workers cada uno puede servir hasta STOCK_CACHE_TTL_S
+# de desfase.
+_stock_cache: TTLCache[int, bytes] = TTLCache(maxsize=64, ttl=STOCK_CACHE_TTL_S)
+
+
+def invalidate_stock_cache() -> None:
+    """Descarta los listados cacheados; llamar tras modificar ``stock``."""
+    _stock_cache.clear()
+
 
-@router.get("")
-async def list_stock() -> list[dict[str, str]]:  # pragma: no cover - placeholder
-    return []
+@router.get("", response_model=list[schemas.StockEntry])
+async def list_stock(
+    limit: int = Query(100, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+) -> Response:
+    require_role(user, "operator")
+    cached = _stock_cache.get(limit)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    stmt = (
+        select(
+            models.Stock.id,
+            models.Stock.item_code,
+            models.Stock.lot,
+            models.Stock.serial,
+            models.Stock.expiry,
+            models.Stock.location,
+            models.Stock.qty,
+        )
+        .order_by(models.Stock.location, models.Stock.item_code)
+        .limit(limit)
+    )
+    rows = (await session.execute(stmt)).mappings().all()
+    await session.close()
+    content = _STOCK_ADAPTER.dump_json(_STOCK_ADAPTER.validate_python(rows))
+    _stock_cache[limit] = content
+    return Response(content=content, media_type="application/json")
@@ -1,8 +1,8 @@
 import datetime as dt
 import uuid
-from typing import Optional
+from typing import Any, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Token(BaseModel):
@@ -33,9 +33,14 @@ class DocScanResponse(BaseModel):
     doc_number: str
 
 
+# Sin caracteres de control ZPL en lo que envía el cliente. ``zpl`` además
+# escapa todo valor sustituido (p. ej. nombres que vienen de la base).
+_ZPL_SAFE = r"^[^\^~]*$"
+
+
 class PrintProductRequest(BaseModel):
-    item_code: str
-    item_name: Optional[str] = None
+    item_code: str = Field(pattern=_ZPL_SAFE)
+    item_name: Optional[str] = Field(default=None, pattern=_ZPL_SAFE)
     fecha_ingreso: dt.date | None = None
     copies: int = Field(ge=1, le=10, default=1)
 
@@ -52,12 +57,34 @@ class PrintJobResponse(BaseModel):
 
 
 class PrintAckRequest(BaseModel):
-    status: str
+    # Mismos valores que el CHECK de print_jobs.status: un estado inválido no
+    # debe hacer fallar el UPDATE agrupado de otros trabajos.
+    status: Literal["queued", "sent", "error", "retry"]
     error: Optional[str] = None
 
 
+class StockEntry(BaseModel):
+    id: uuid.UUID
+    item_code: str
+    lot: str
+    serial: str
+    expiry: Optional[dt.date] = None
+    location: str
+    qty: int
+
+
+class AuditEntry(BaseModel):
+    id: uuid.UUID
+    entity: str
+    entity_id: str
+    action: str
+    payload_json: dict[str, Any]
+    user_id: Optional[uuid.UUID] = None
+    ts: dt.datetime
+
+
 class MoveCreateRequest(BaseModel):
-    doc_type: str = Field(pattern="^(PO|SO|TR|RT)$")
+    doc_type: Literal["PO", "SO", "TR", "RT"]
     doc_number: str = Field(min_length=1, max_length=64)
 
 
@@ -67,6 +94,9 @@ class MoveLineInput(BaseModel):
     qty_confirmed: Optional[int] = Field(default=None, ge=0)
     location_from: str = Field(default="MAIN", max_length=64)
     location_to: str = Field(default="MAIN", max_length=64)
+    # "" identifica el stock sin lote/serie, como en ``models.Stock``.
+    lot: str = Field(default="", max_length=64)
+    serial: str = Field(default="", max_length=64)
 
 
 class MoveConfirmRequest(BaseModel):
@@ -74,6 +104,8 @@ class MoveConfirmRequest(BaseModel):
 
 
 class MoveLineResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: uuid.UUID
     item_code: str
     qty: int
@@ -83,6 +115,9 @@ class MoveLineResponse(BaseModel):
 
 
 class MoveResponse(BaseModel):
+    # Se valida directo desde models.Move (con sus líneas ya cargadas).
+    model_config = ConfigDict(from_attributes=True)
+
     id: uuid.UUID
     doc_type: str
     doc_number: str
@@ -1,21 +1,38 @@
-from jinja2 import Template
+from functools import lru_cache
 
-ZPL_TEMPLATE = Template(
-    """^XA
+# Plantilla plana con str.format: tres sustituciones no justifican Jinja.
+# Cada ^FD va precedido de ^FH (indicador "_"), así los valores se escriben
+# con ``_escape_field`` y un ^ o ~ llega a la etiqueta como texto, nunca
+# como comando, venga del request o de la base de datos.
+_ZPL_TEMPLATE = """^XA
 ^CI28
 ^PW240
 ^LL400
-^FO10,10^A0N,26,26^FD{{ item_name }}^FS
-^FO10,50^A0N,24,24^FDSKU: {{ item_code }}^FS
-^FO10,90^BCN,80,Y,N,N^FD{{ item_code }}^FS
-^FO10,190^A0N,22,22^FDFECHA: {{ fecha_ingreso }}^FS
+^FO10,10^A0N,26,26^FH^FD{item_name}^FS
+^FO10,50^A0N,24,24^FH^FDSKU: {item_code}^FS
+^FO10,90^BCN,80,Y,N,N^FH^FD{item_code}^FS
+^FO10,190^A0N,22,22^FH^FDFECHA: {fecha_ingreso}^FS
+^PQ{copies},0,1,Y
 ^XZ"""
-)
 
+# translate mapea cada carácter una sola vez: el "_" de un escape ya
+# emitido no se vuelve a escapar.
+_FIELD_ESCAPES = str.maketrans({"_": "_5F", "^": "_5E", "~": "_7E"})
 
-def render_product_label(item_code: str, item_name: str, fecha_ingreso: str) -> str:
-    return ZPL_TEMPLATE.render(
-        item_code=item_code,
-        item_name=item_name,
-        fecha_ingreso=fecha_ingreso,
+
+def _escape_field(value: str) -> str:
+    """Codifica en hexadecimal ^FH los caracteres de control ZPL y el indicador."""
+    return value.translate(_FIELD_ESCAPES)
+
+
+@lru_cache(maxsize=1024)
+def render_product_label(item_code: str, item_name: str, fecha_ingreso: str, copies: int = 1) -> str:
+    # Función pura de argumentos hashables: se cachea por SKU/fecha/copias
+    # (fecha ya formateada dd-mm-YYYY por el llamador), sin invalidación.
+    # ^PQ deja que la impresora replique la etiqueta ``copies`` veces.
+    return _ZPL_TEMPLATE.format(
+        item_code=_escape_field(item_code),
+        item_name=_escape_field(item_name),
+        fecha_ingreso=_escape_field(fecha_ingreso),
+        copies=int(copies),
     )
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app import audit_queue
+
+
+class DrainTests(unittest.IsolatedAsyncioTestCase):
+    async def test_drain_stops_at_max_items(self) -> None:
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for value in range(10):
+            queue.put_nowait(value)
+        items: list[int] = []
+        await audit_queue.drain(queue, items, max_items=4, timeout=1)
+        self.assertEqual(items, [0, 1, 2, 3])
+        self.assertEqual(queue.qsize(), 6)
+
+    async def test_drain_returns_partial_batch_after_timeout(self) -> None:
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        queue.put_nowait(1)
+        items: list[int] = []
+        await audit_queue.drain(queue, items, max_items=500, timeout=0.02)
+        self.assertEqual(items, [1])
+
+    def test_enqueue_drops_when_full(self) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        original = audit_queue.QUEUE
+        audit_queue.QUEUE = queue
+        try:
+            audit_queue.enqueue({"entity": "auth", "action": "login_failed"})
+            audit_queue.enqueue({"entity": "auth", "action": "login_failed"})
+        finally:
+            audit_queue.QUEUE = original
+        self.assertEqual(queue.qsize(), 1)
+
+
+class _AuditSession:
+    """Falla el commit si el lote trae algún registro sin ``entity``."""
+
+    def __init__(self, written: list) -> None:
+        self.written = written
+        self.pending: list = []
+
+    async def __aenter__(self) -> "_AuditSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    def add_all(self, rows: list) -> None:
+        self.pending = rows
+
+    async def commit(self) -> None:
+        if any(row.entity is None for row in self.pending):
+            raise ValueError("entity NOT NULL")
+        self.written.extend(row.action for row in self.pending)
+
+
+class WriteBatchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_batch_is_retried_row_by_row(self) -> None:
+        written: list[str] = []
+        entries = [
+            {"entity": "move", "action": "created"},
+            {"entity": None, "action": "roto"},
+            {"entity": "move", "action": "confirmed"},
+        ]
+        with patch.object(audit_queue, "SessionLocal", lambda: _AuditSession(written)):
+            with self.assertLogs(audit_queue.LOGGER, "ERROR") as logs:
+                await audit_queue._write_batch(entries)
+
+        self.assertEqual(written, ["created", "confirmed"])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("roto", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch
 
 from app import auth
+from app.routers import auth as auth_router
 
 
 class VerifyPasswordTests(unittest.TestCase):
@@ -11,13 +12,32 @@ class VerifyPasswordTests(unittest.TestCase):
     def test_verify_password_success(self) -> None:
         self.assertTrue(auth.verify_password("Admin#1234", self.hashed))
 
-    def test_verify_password_fallbacks_when_passlib_fails(self) -> None:
-        with patch.object(auth.pwd_context, "verify", side_effect=ValueError):
-            self.assertTrue(auth.verify_password("Admin#1234", self.hashed))
-
     def test_verify_password_returns_false_on_invalid_credentials(self) -> None:
+        self.assertFalse(auth.verify_password("wrong", self.hashed))
+
+    def test_verify_password_returns_false_when_passlib_fails(self) -> None:
         with patch.object(auth.pwd_context, "verify", side_effect=ValueError):
-            self.assertFalse(auth.verify_password("wrong", self.hashed))
+            self.assertFalse(auth.verify_password("Admin#1234", self.hashed))
+
+    def test_new_hashes_use_argon2(self) -> None:
+        hashed = auth.get_password_hash("Admin#1234")
+        self.assertTrue(hashed.startswith("$argon2id$"))
+        self.assertTrue(auth.verify_password("Admin#1234", hashed))
+        self.assertFalse(auth.password_needs_rehash(hashed))
+
+    def test_bcrypt_hashes_need_rehash(self) -> None:
+        self.assertTrue(auth.password_needs_rehash(self.hashed))
+
+
+class DummyHashTests(unittest.TestCase):
+    def test_dummy_hash_matches_stored_bcrypt_cost(self) -> None:
+        # Mismo esquema y costo que el admin sembrado: usuario inexistente y
+        # contraseña errónea tardan lo mismo.
+        seeded = "$2b$12$1nqmxCFIvossKXkg0vvicuKEGDYZUtm1gea3xMN2rf4hZ8alJFvum"
+        dummy = auth_router._DUMMY_HASH
+        self.assertEqual(auth.pwd_context.identify(dummy), auth.pwd_context.identify(seeded))
+        self.assertEqual(dummy.split("$")[2], seeded.split("$")[2])
+        self.assertFalse(auth.verify_password("Admin#1234", dummy))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+import unittest
+
+from sqlalchemy.dialects import postgresql
+
+from app.routers.import_abcxyz import PRODUCT_FIELDS, _upsert_products
+
+
+class _RecordingSession:
+    def __init__(self) -> None:
+        self.statements: list = []
+
+    async def execute(self, stmt) -> None:
+        self.statements.append(stmt)
+
+
+class UpsertProductsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_upsert_maps_attribute_names_to_columns(self) -> None:
+        row = {field: 0 for field in PRODUCT_FIELDS} | {
+            "item_code": "SKU-1",
+            "item_name": "Tornillo",
+            "ABC": "A",
+            "XYZ": "X",
+            "BelowROP": False,
+        }
+        session = _RecordingSession()
+
+        imported = await _upsert_products(session, [row])
+
+        self.assertEqual(imported, 1)
+        self.assertEqual(len(session.statements), 1)
+        sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (item_code) DO UPDATE", sql)
+        self.assertIn("abc = excluded.abc", sql)
+        self.assertIn("xyz = excluded.xyz", sql)
+        self.assertIn("belowrop = excluded.belowrop", sql)
+        self.assertNotIn("item_code = excluded.item_code", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
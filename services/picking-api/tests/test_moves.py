@@ -0,0 +1,259 @@
+import datetime as dt
+import unittest
+import uuid
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app import models, schemas
+from app.auth import UserSnapshot
+from app.main import app
+from app.routers.moves import _build_move_response, _raise_for_missing_products, confirm_move
+
+OPERATOR = UserSnapshot(uuid.uuid4(), "ana", "operator", True, 0)
+
+
+class BuildMoveResponseTests(unittest.TestCase):
+    def test_build_move_response_includes_lines(self) -> None:
+        now = dt.datetime(2024, 1, 1, 12, 0)
+        line = models.MoveLine(
+            id=uuid.uuid4(),
+            item_code="SKU-1",
+            qty=5,
+            qty_confirmed=3,
+            location_from="MAIN",
+            location_to="MAIN",
+        )
+        move = models.Move(
+            id=uuid.uuid4(),
+            type="inbound",
+            doc_type="PO",
+            doc_number="123",
+            status="pending",
+            created_at=now,
+            updated_at=now,
+            lines=[line],
+        )
+
+        response = _build_move_response(move)
+
+        self.assertEqual(response.id, move.id)
+        self.assertEqual(response.doc_type, "PO")
+        self.assertEqual(len(response.lines), 1)
+        self.assertEqual(response.lines[0].item_code, "SKU-1")
+        self.assertEqual(response.lines[0].qty_confirmed, 3)
+
+
+class MoveLinesLoadingTests(unittest.TestCase):
+    def test_listing_moves_loads_all_lines_in_one_extra_select(self) -> None:
+        engine = create_engine("sqlite://")
+        models.Base.metadata.create_all(engine, tables=[models.Move.__table__, models.MoveLine.__table__])
+        with Session(engine) as session:
+            for number in range(3):
+                session.add(
+                    models.Move(
+                        type="inbound",
+                        doc_type="PO",
+                        doc_number=str(number),
+                        created_by=uuid.uuid4(),
+                        lines=[models.MoveLine(item_code=f"SKU-{number}-{i}", qty=1) for i in range(2)],
+                    )
+                )
+            session.commit()
+
+        selects: list[str] = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda _conn, _cursor, statement, *_args: selects.append(statement),
+        )
+        with Session(engine) as session:
+            moves = session.scalars(select(models.Move)).all()
+            line_counts = [len(move.lines) for move in moves]
+
+        self.assertEqual(line_counts, [2, 2, 2])
+        self.assertEqual(len(selects), 2)
+        self.assertIn("FROM move_lines", selects[1])
+        self.assertIn(" IN ", selects[1])
+
+
+class ConfirmMoveRouteTests(unittest.TestCase):
+    def test_confirm_documents_request_body(self) -> None:
+        operation = app.openapi()["paths"]["/moves/{move_id}/confirm"]["post"]
+        schema = operation["requestBody"]["content"]["application/json"]["schema"]
+        self.assertEqual(schema["required"], ["lines"])
+        self.assertIn("item_code", schema["properties"]["lines"]["items"]["properties"])
+
+    def test_confirm_authenticates_before_reading_body(self) -> None:
+        response = TestClient(app).post(f"/moves/{uuid.uuid4()}/confirm", content=b"no es json")
+        self.assertEqual(response.status_code, 401)
+
+
+class _FakeResult:
+    def __init__(self, value) -> None:
+        self._value = value
+
+    def unique(self) -> "_FakeResult":
+        return self
+
+    def scalar_one_or_none(self):
+        return self._value
+
+    def scalars(self) -> "_FakeResult":
+        return self
+
+    def all(self):
+        return self._value
+
+
+class _FakeSession:
+    """Sesión mínima para ``confirm_move``: guarda cada sentencia DML."""
+
+    def __init__(self, move: models.Move, *, remaining: list[int | None] = (), products: list[str] = ()) -> None:
+        self.move = move
+        self.remaining = list(remaining)
+        self.products = list(products)
+        self.statements: list = []
+
+    async def execute(self, stmt):
+        if isinstance(stmt, Select):
+            entity = stmt.column_descriptions[0]["entity"]
+            return _FakeResult(self.move if entity is models.Move else self.products)
+        self.statements.append(stmt)
+        return _FakeResult(None)
+
+    async def scalar(self, stmt):
+        self.statements.append(stmt)
+        return self.remaining.pop(0)
+
+    async def commit(self) -> None:
+        # Lo que haría el flush: ids por defecto de las líneas nuevas.
+        for line in self.move.lines:
+            line.id = line.id or uuid.uuid4()
+
+    async def rollback(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def _pending_move(doc_type: str) -> models.Move:
+    now = dt.datetime(2024, 1, 1, 12, 0)
+    return models.Move(
+        id=uuid.uuid4(),
+        type="pending",
+        doc_type=doc_type,
+        doc_number="D-1",
+        status="pending",
+        created_at=now,
+        updated_at=now,
+        lines=[],
+    )
+
+
+def _compile(stmt) -> tuple[str, dict]:
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+@patch("app.routers.moves.audit_queue.enqueue")
+class ConfirmMoveTests(unittest.IsolatedAsyncioTestCase):
+    async def test_outbound_decrements_the_line_lot(self, _enqueue) -> None:
+        session = _FakeSession(_pending_move("SO"), remaining=[7])
+        payload = schemas.MoveConfirmRequest(lines=[{"item_code": "SKU-1", "qty": 3, "lot": "L-01"}])
+
+        response = await confirm_move(str(session.move.id), OPERATOR, session, payload)
+
+        self.assertEqual(response.status, "approved")
+        self.assertEqual(response.type, "outbound")
+        self.assertEqual(len(session.statements), 1)
+        sql, params = _compile(session.statements[0])
+        self.assertTrue(sql.startswith("UPDATE stock SET qty=(stock.qty - %(qty_1)s"))
+        for predicate in ("stock.lot = %(lot_1)s", "stock.serial = %(serial_1)s", "stock.qty >= %(qty_2)s"):
+            self.assertIn(predicate, sql)
+        self.assertEqual(params["lot_1"], "L-01")
+        self.assertEqual(params["serial_1"], "")
+        self.assertEqual((params["qty_1"], params["qty_2"]), (3, 3))
+        self.assertEqual(session.move.lines[0].lot, "L-01")
+
+    async def test_outbound_without_enough_stock_is_400(self, _enqueue) -> None:
+        session = _FakeSession(_pending_move("SO"), remaining=[None], products=["SKU-1"])
+        payload = schemas.MoveConfirmRequest(lines=[{"item_code": "SKU-1", "qty": 3}])
+
+        with self.assertRaises(HTTPException) as ctx:
+            await confirm_move(str(session.move.id), OPERATOR, session, payload)
+
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(ctx.exception.detail, "Stock insuficiente para SKU-1")
+        self.assertEqual(session.move.lines, [])
+        _enqueue.assert_not_called()
+
+    async def test_inbound_sums_repeated_items_into_one_upsert_row(self, _enqueue) -> None:
+        session = _FakeSession(_pending_move("PO"))
+        payload = schemas.MoveConfirmRequest(
+            lines=[
+                {"item_code": "SKU-1", "qty": 2},
+                {"item_code": "SKU-2", "qty": 4},
+                {"item_code": "SKU-1", "qty": 5, "qty_confirmed": 3},
+            ]
+        )
+
+        response = await confirm_move(str(session.move.id), OPERATOR, session, payload)
+
+        self.assertEqual(response.status, "pending")
+        self.assertEqual(len(response.lines), 3)
+        self.assertEqual(len(session.statements), 1)
+        sql, params = _compile(session.statements[0])
+        self.assertIn(
+            "ON CONFLICT (item_code, lot, serial, location) DO UPDATE SET qty = (stock.qty + excluded.qty)", sql
+        )
+        rows = {params[f"item_code_m{i}"]: params[f"qty_m{i}"] for i in range(2)}
+        self.assertEqual(rows, {"SKU-1": 5, "SKU-2": 4})
+        self.assertNotIn("item_code_m2", params)
+
+
+class _DriverError(Exception):
+    def __init__(self, sqlstate: str, constraint_name: str | None) -> None:
+        super().__init__("violación de restricción")
+        self.constraint_name = constraint_name
+        self.sqlstate = sqlstate
+
+
+def _integrity_error(sqlstate: str, constraint_name: str | None) -> IntegrityError:
+    # Igual que el adaptador de asyncpg: la excepción DBAPI lleva sqlstate y
+    # encadena la del driver, que trae constraint_name.
+    orig = Exception("violación de restricción")
+    orig.sqlstate = sqlstate
+    orig.__cause__ = _DriverError(sqlstate, constraint_name)
+    return IntegrityError("INSERT ...", {}, orig)
+
+
+class RaiseForMissingProductsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_product_fk_violation_becomes_404(self) -> None:
+        session = _FakeSession(_pending_move("PO"), products=["SKU-1"])
+        exc = _integrity_error("23503", "stock_item_code_fkey")
+
+        with self.assertRaises(HTTPException) as ctx:
+            await _raise_for_missing_products(session, exc, ["SKU-1", "SKU-9"])
+
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(ctx.exception.detail, "Producto SKU-9 no existe")
+
+    async def test_other_integrity_errors_are_left_to_the_caller(self) -> None:
+        session = _FakeSession(_pending_move("PO"), products=["SKU-1"])
+        for exc in (
+            _integrity_error("23503", "moves_created_by_fkey"),
+            _integrity_error("23505", "stock_item_code_fkey"),
+        ):
+            await _raise_for_missing_products(session, exc, ["SKU-9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import asyncio
+import datetime as dt
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from sqlalchemy.dialects import postgresql
+
+from app import models, schemas
+from app.auth import UserSnapshot
+from app.routers import printing
+from app.routers.printing import AckBatcher, _PendingAck, _split_duplicates, enqueue_product_label
+
+
+class SplitDuplicatesTests(unittest.TestCase):
+    def test_repeated_job_ids_are_carried_to_next_batch(self) -> None:
+        first, second = uuid.uuid4(), uuid.uuid4()
+        batch = [
+            _PendingAck(first, "error", "sin papel", None),
+            _PendingAck(second, "sent", None, None),
+            _PendingAck(first, "sent", None, None),
+        ]
+
+        unique, carry = _split_duplicates(batch)
+
+        self.assertEqual(list(unique), [first, second])
+        self.assertEqual(unique[first].status, "error")
+        self.assertEqual(carry, [batch[2]])
+
+
+class _AckSession:
+    """Simula el UPDATE ... RETURNING sobre los trabajos de ``existing``."""
+
+    def __init__(self, existing: dict[uuid.UUID, str]) -> None:
+        self.existing = existing
+        self.statements: list = []
+
+    async def __aenter__(self) -> "_AckSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        ids = stmt.compile(dialect=postgresql.dialect()).params["id_1"]
+        return _FakeResult([(job_id, self.existing[job_id]) for job_id in ids if job_id in self.existing])
+
+    async def commit(self) -> None:
+        pass
+
+
+class AckBatcherTests(unittest.IsolatedAsyncioTestCase):
+    def _ack(self, job_id: uuid.UUID, status: str, error: str | None = None) -> _PendingAck:
+        return _PendingAck(job_id, status, error, asyncio.get_running_loop().create_future())
+
+    async def test_write_updates_batch_with_case_and_carries_duplicates(self) -> None:
+        first, second, missing = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        batch = [self._ack(first, "error", "sin papel"), self._ack(second, "sent"), self._ack(missing, "sent")]
+        batch.append(self._ack(first, "sent"))
+        session = _AckSession({first: "error", second: "sent"})
+
+        with patch.object(printing, "SessionLocal", lambda: session):
+            carry = await AckBatcher()._write(batch)
+
+        self.assertEqual(carry, [batch[3]])
+        self.assertEqual(len(session.statements), 1)
+        compiled = session.statements[0].compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        self.assertEqual(compiled.params["id_1"], [first, second, missing])
+        self.assertIn("sin papel", compiled.params.values())
+        self.assertIn("status=CASE print_jobs.id WHEN", sql)
+        self.assertIn("attempts=(print_jobs.attempts + CASE print_jobs.id WHEN", sql)
+        self.assertEqual(batch[0].future.result(), "error")
+        self.assertEqual(batch[1].future.result(), "sent")
+        self.assertIsNone(batch[2].future.result())
+        self.assertFalse(batch[3].future.done())
+
+        session.existing[first] = "sent"
+        with patch.object(printing, "SessionLocal", lambda: session):
+            self.assertEqual(await AckBatcher()._write(carry), [])
+        self.assertEqual(batch[3].future.result(), "sent")
+
+    async def test_submit_without_writer_fails_fast(self) -> None:
+        with self.assertRaises(RuntimeError):
+            await AckBatcher().submit(uuid.uuid4(), "sent", None)
+
+    async def test_writer_failure_fails_pending_acks(self) -> None:
+        batcher = AckBatcher()
+        boom = ValueError("se cayó el writer")
+
+        async def drain(queue, *_args) -> None:
+            # Falla con el ACK todavía en cola, antes de armar el lote.
+            while queue.empty():
+                await asyncio.sleep(0)
+            raise boom
+
+        with patch.object(printing.audit_queue, "drain", drain):
+            batcher.start()
+            pending = asyncio.ensure_future(batcher.submit(uuid.uuid4(), "sent", None))
+            with self.assertRaises(ValueError):
+                await asyncio.wait_for(pending, 1)
+
+
+class _FakeResult:
+    def __init__(self, value) -> None:
+        self._value = value
+
+    def scalar_one_or_none(self):
+        return self._value
+
+    def one(self):
+        return self._value
+
+    def all(self):
+        return self._value
+
+
+class _FakeSession:
+    """Devuelve el producto en el SELECT y la fila del INSERT después."""
+
+    def __init__(self, product: models.Product) -> None:
+        self._results = [product]
+        self.inserted: dict | None = None
+
+    async def execute(self, stmt):
+        if not self._results:
+            self.inserted = stmt.compile().params
+            row = {
+                "id": uuid.uuid4(),
+                "status": "queued",
+                "attempts": 0,
+                "last_error": None,
+                "created_at": dt.datetime(2024, 1, 1),
+            }
+            return _FakeResult(SimpleNamespace(_mapping=row))
+        return _FakeResult(self._results.pop(0))
+
+    async def commit(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class EnqueueProductLabelTests(unittest.IsolatedAsyncioTestCase):
+    async def test_db_product_name_cannot_inject_zpl(self) -> None:
+        product = models.Product(item_code="SKU-1", item_name="Caja ^XZ^XA~JA")
+        session = _FakeSession(product)
+        user = UserSnapshot(uuid.uuid4(), "ana", "operator", True, 0)
+
+        job = await enqueue_product_label(schemas.PrintProductRequest(item_code="SKU-1"), session, user)
+
+        self.assertIn("^FH^FDCaja _5EXZ_5EXA_7EJA^FS", job.payload_zpl)
+        self.assertEqual(job.payload_zpl.count("^XA"), 1)
+        self.assertEqual(job.payload_zpl.count("^XZ"), 1)
+        self.assertEqual(session.inserted["payload_zpl"], job.payload_zpl)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from pydantic import ValidationError
+
+from app import schemas, zpl
+
+
+class RenderProductLabelTests(unittest.TestCase):
+    def test_render_substitutes_fields(self) -> None:
+        label = zpl.render_product_label(item_code="SKU-1", item_name="Tornillo", fecha_ingreso="01-02-2024")
+        self.assertTrue(label.startswith("^XA"))
+        self.assertTrue(label.endswith("^XZ"))
+        self.assertIn("^FDTornillo^FS", label)
+        self.assertIn("^FDSKU: SKU-1^FS", label)
+        self.assertIn("^BCN,80,Y,N,N^FH^FDSKU-1^FS", label)
+        self.assertIn("^FDFECHA: 01-02-2024^FS", label)
+        self.assertIn("^PQ1,0,1,Y", label)
+
+    def test_render_encodes_copies_in_print_quantity(self) -> None:
+        label = zpl.render_product_label(item_code="SKU-1", item_name="Tornillo", fecha_ingreso="01-02-2024", copies=3)
+        self.assertIn("^PQ3,0,1,Y\n^XZ", label)
+
+    def test_render_escapes_zpl_control_characters(self) -> None:
+        label = zpl.render_product_label(item_code="SKU_1", item_name="Tapa ^XZ~JA", fecha_ingreso="01-02-2024")
+        self.assertIn("^FH^FDTapa _5EXZ_7EJA^FS", label)
+        self.assertIn("^FH^FDSKU_5F1^FS", label)
+        self.assertEqual(label.count("^XZ"), 1)
+        self.assertNotIn("~", label)
+
+    def test_print_request_rejects_zpl_control_characters(self) -> None:
+        with self.assertRaises(ValidationError):
+            schemas.PrintProductRequest(item_code="SKU^XZ")
+        with self.assertRaises(ValidationError):
+            schemas.PrintProductRequest(item_code="SKU-1", item_name="~JA")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,20 +1,93 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
 import os
+from collections.abc import AsyncIterator
+from functools import lru_cache
+from itertools import zip_longest
 from pathlib import Path
 from typing import Any
 
 import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
 from fastapi import FastAPI, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
 BASE_DIR = Path(__file__).parent
 API_BASE_URL = os.getenv("PICKING_API_URL", "http://picking-api:8000")
 API_TIMEOUT = float(os.getenv("PICKING_API_TIMEOUT", "10"))
-
-app = FastAPI(title="Picking UI", version="0.1.0")
-app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+# Máximo de POST /print/product simultáneos por envío del formulario.
+PRINT_CONCURRENCY = 16
+API_CACHE_TTL_S = float(os.getenv("PICKING_UI_CACHE_TTL", "5"))
+JINJA_CACHE_DIR = Path(os.getenv("JINJA_CACHE_DIR", "/tmp/jinja_cache"))
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Un solo cliente por proceso: conexiones keep-alive reutilizadas hacia
+    # picking-api en lugar de un handshake y un pool nuevos por llamada.
+    # Conectar y esperar el pool fallan rápido; sólo la lectura usa
+    # API_TIMEOUT. El transporte reintenta únicamente errores de conexión,
+    # seguros también para POST porque la request nunca salió.
+    async with httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        timeout=httpx.Timeout(API_TIMEOUT, connect=1.0, write=5.0, pool=2.0),
+        transport=httpx.AsyncHTTPTransport(
+            retries=2,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+        ),
+    ) as client:
+        app.state.api_client = client
+        yield
+
+
+app = FastAPI(
+    title="Picking UI",
+    version="0.1.0",
+    lifespan=lifespan,
+)
+# HTML y estáticos comprimen muy bien; bajo 512 bytes no compensa.
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
+
+class CachedStaticFiles(StaticFiles):
+    """Estáticos cacheables un año: las URL llevan ``?v=<STATIC_VERSION>``."""
+
+    def file_response(self, *args: Any, **kwargs: Any) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# Hash del contenido de static/: cambia con cada deploy que toque un asset y
+# con él la URL, así el navegador no revalida nunca una versión ya bajada.
+STATIC_VERSION = hashlib.blake2b(
+    b"".join(path.read_bytes() for path in sorted((BASE_DIR / "static").rglob("*")) if path.is_file()),
+    digest_size=8,
+).hexdigest()
+app.mount("/static", CachedStaticFiles(directory=BASE_DIR / "static"), name="static")
+
+# Bytecode compartido en disco entre workers y reinicios; sin auto_reload
+# (cambiar una plantilla requiere reiniciar). autoescape se fija a mano
+# porque Starlette sólo lo activa cuando crea el Environment él mismo.
+JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+_jinja_env = Environment(
+    loader=FileSystemLoader(str(BASE_DIR / "templates")),
+    bytecode_cache=FileSystemBytecodeCache(str(JINJA_CACHE_DIR)),
+    auto_reload=False,
+    autoescape=True,
+)
+_jinja_env.globals["static_version"] = STATIC_VERSION
+templates = Jinja2Templates(env=_jinja_env)
+# Compilación anticipada: ninguna request paga el primer parseo.
+for _template_name in _jinja_env.list_templates(extensions=["html"]):
+    _jinja_env.get_template(_template_name)
 
 
 OPERATIONS = [
@@ -55,28 +128,102 @@ OPERATIONS = [
         "status": "Disponible",
     },
 ]
+OPERATIONS_BY_DOC_TYPE = {op["doc_type"]: op for op in OPERATIONS}
+
+# Versión del dashboard: cambia si cambian las operaciones, las plantillas o
+# los estáticos (sus URL van en el HTML), así un deploy invalida los ETag ya
+# entregados.
+DASHBOARD_VERSION = hashlib.blake2b(
+    (STATIC_VERSION + repr(OPERATIONS)).encode()
+    + (BASE_DIR / "templates" / "base.html").read_bytes()
+    + (BASE_DIR / "templates" / "dashboard.html").read_bytes(),
+    digest_size=8,
+).hexdigest()
+
+
+async def _api_request(method: str, path: str, headers: dict[str, str], **kwargs: Any) -> httpx.Response:
+    # ``headers`` se comparte entre llamadas de la misma request (ver
+    # ``_require_auth``); httpx lo copia, nunca lo modifica.
+    client: httpx.AsyncClient = app.state.api_client
+    return await client.request(method, path, headers=headers, **kwargs)
 
 
-async def _api_request(method: str, path: str, token: str | None, **kwargs: Any) -> httpx.Response:
-    headers = kwargs.pop("headers", {})
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=API_TIMEOUT) as client:
-        response = await client.request(method, path, headers=headers, **kwargs)
+async def _api_get(path: str, auth: dict[str, str]) -> httpx.Response:
+    # GET idempotente: un ReadTimeout se reintenta una vez.
+    try:
+        return await _api_request("GET", path, auth)
+    except httpx.ReadTimeout:
+        return await _api_request("GET", path, auth)
+
+
+# Respuestas 200 de GET de sólo lectura, por (path, Authorization) para que
+# un usuario nunca vea lo cacheado con las credenciales de otro. La caché es
+# por proceso: con varios workers de Gunicorn otro worker puede servir lo
+# viejo hasta el TTL, así que sólo se cachean listados que toleran ese
+# atraso, nunca el detalle de un movimiento que se acaba de mutar.
+_get_cache: TTLCache[tuple[str, str], httpx.Response] = TTLCache(maxsize=1024, ttl=API_CACHE_TTL_S)
+
+
+async def _cached_get(path: str, auth: dict[str, str]) -> httpx.Response:
+    # Sin lock: dos misses simultáneos sólo duplican la consulta a la API.
+    key = (path, auth.get("Authorization", ""))
+    cached = _get_cache.get(key)
+    if cached is not None:
+        return cached
+    response = await _api_get(path, auth)
+    if response.status_code == 200:
+        _get_cache[key] = response
     return response
 
 
-def _require_token(request: Request) -> str | None:
-    token = request.cookies.get("auth_token")
-    if not token:
+def _invalidate_get(path: str) -> None:
+    """Descarta ``path`` para todos los tokens en este proceso; llamar tras mutarlo."""
+    for key in [key for key in _get_cache if key[0] == path]:
+        _get_cache.pop(key, None)
+
+
+def _require_auth(request: Request) -> dict[str, str] | None:
+    """Headers para picking-api con el token de la cookie, o ``None`` sin sesión.
+
+    Se arman una vez por request y se reutilizan en todas sus llamadas.
+    """
+    auth = getattr(request.state, "auth_headers", None)
+    if auth is None:
+        token = request.cookies.get("auth_token")
+        if not token:
+            return None
+        auth = request.state.auth_headers = {"Authorization": f"Bearer {token}"}
+    return auth
+
+
+@lru_cache(maxsize=1024)
+def _token_username(token: str) -> str | None:
+    # Sólo para mostrar el nombre: la firma la valida picking-api en cada
+    # llamada, aquí basta leer el claim sin verificar.
+    try:
+        payload = token.split(".")[1]
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
         return None
-    return token
+    username = claims.get("preferred_username") if isinstance(claims, dict) else None
+    return username if isinstance(username, str) else None
+
+
+def _request_username(request: Request) -> str | None:
+    token = request.cookies.get("auth_token")
+    return _token_username(token) if token else None
+
+
+def _json(response: httpx.Response) -> Any:
+    # orjson sobre los bytes ya leídos, en lugar del json de la stdlib que
+    # usa httpx.Response.json().
+    return orjson.loads(response.content)
 
 
 def _safe_detail(response: httpx.Response, default: str) -> str:
     try:
-        data = response.json()
-    except ValueError:
+        data = _json(response)
+    except orjson.JSONDecodeError:
         return default
     detail = data.get("detail") if isinstance(data, dict) else None
     return detail if isinstance(detail, str) else default
@@ -86,20 +233,58 @@ def _dashboard_context(request: Request) -> dict:
     return {
         "request": request,
         "operations": OPERATIONS,
-        "username": request.cookies.get("username"),
+        "username": _request_username(request),
     }
 
 
+# HTML ya renderizado y su ETag por (username, base_url): lo único que varía
+# entre usuarios es el nombre y las URLs absolutas que arma url_for.
+_dashboard_cache: LRUCache[tuple[str | None, str], tuple[str, str]] = LRUCache(maxsize=256)
+
+
 @app.get("/", response_class=HTMLResponse, name="dashboard")
 async def dashboard(request: Request):
-    if _require_token(request) is None:
+    if _require_auth(request) is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
-    return templates.TemplateResponse("dashboard.html", _dashboard_context(request))
-
-
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_alias(request: Request):
-    return await dashboard(request)
+    username = _request_username(request)
+    key = (username, str(request.base_url))
+    cached = _dashboard_cache.get(key)
+    if cached is None:
+        digest = hashlib.blake2b(f"{DASHBOARD_VERSION}|{username}|{key[1]}".encode(), digest_size=8).hexdigest()
+        html = templates.get_template("dashboard.html").render(_dashboard_context(request))
+        cached = _dashboard_cache[key] = (f'W/"{digest}"', html)
+    etag, html = cached
+    # no-cache: el navegador revalida siempre (304 barato), así cerrar sesión
+    # no deja el dashboard servido desde su caché.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return HTMLResponse(html, headers=headers)
+
+
+# Mismo handler en /dashboard, sin una corrutina intermedia; url_for sigue
+# resolviendo "dashboard" a "/".
+app.add_api_route("/dashboard", dashboard, methods=["GET"], response_class=HTMLResponse, name="dashboard_alias")
+
+
+# Error de formulario vacío ya renderizado, por base_url (url_for arma URLs
+# absolutas). Con usuario escrito se sigue renderizando en cada request.
+_LOGIN_EMPTY_MESSAGE = "Completa usuario y contraseña para continuar."
+_login_empty_cache: LRUCache[str, str] = LRUCache(maxsize=16)
+
+
+def _login_empty_html(request: Request) -> str:
+    base_url = str(request.base_url)
+    html = _login_empty_cache.get(base_url)
+    if html is None:
+        context = {
+            "request": request,
+            "form_error": _LOGIN_EMPTY_MESSAGE,
+            "username": "",
+            "login_action": str(request.url_for("login_submit")),
+        }
+        html = _login_empty_cache[base_url] = templates.get_template("login.html").render(context)
+    return html
 
 
 @app.get("/login", response_class=HTMLResponse)
@@ -109,7 +294,7 @@ async def login(request: Request):
         {
             "request": request,
             "form_error": None,
-            "username": request.cookies.get("username", ""),
+            "username": _request_username(request) or "",
             "login_action": str(request.url_for("login_submit")),
         },
     )
@@ -125,8 +310,8 @@ async def login_submit(request: Request):
 
     if is_json_request:
         try:
-            payload = await request.json()
-        except ValueError:
+            payload = orjson.loads(await request.body())
+        except orjson.JSONDecodeError:
             payload = None
         if isinstance(payload, dict):
             username = payload.get("username")
@@ -137,9 +322,11 @@ async def login_submit(request: Request):
         password = form.get("password")
 
     if not username or not password:
-        message = "Completa usuario y contraseña para continuar."
+        message = _LOGIN_EMPTY_MESSAGE
         if is_json_request:
             return JSONResponse({"detail": message}, status_code=status.HTTP_400_BAD_REQUEST)
+        if not username:
+            return HTMLResponse(_login_empty_html(request), status_code=status.HTTP_400_BAD_REQUEST)
         context = {
             "request": request,
             "form_error": message,
@@ -152,7 +339,7 @@ async def login_submit(request: Request):
         api_response = await _api_request(
             "POST",
             "/auth/login",
-            token=None,
+            {},
             json={"username": username, "password": password},
         )
     except httpx.RequestError:
@@ -180,7 +367,7 @@ async def login_submit(request: Request):
         }
         return templates.TemplateResponse("login.html", context, status_code=status.HTTP_401_UNAUTHORIZED)
 
-    token = api_response.json().get("access_token")
+    token = _json(api_response).get("access_token")
     if not token:
         raise HTTPException(status_code=500, detail="Token inválido devuelto por la API")
 
@@ -190,17 +377,19 @@ async def login_submit(request: Request):
     else:
         response = RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
     response.set_cookie("auth_token", token, httponly=True, samesite="lax")
-    response.set_cookie("username", username, samesite="lax")
+    # El nombre viaja en el JWT; se borra la cookie que dejaban versiones previas.
+    if "username" in request.cookies:
+        response.delete_cookie("username")
     return response
 
 
 @app.get("/moves/new", response_class=HTMLResponse)
 async def moves_new(request: Request):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
     selected_type = request.query_params.get("type")
-    selected = next((op for op in OPERATIONS if op["doc_type"] == selected_type), None)
+    selected = OPERATIONS_BY_DOC_TYPE.get(selected_type)
     context = {
         "request": request,
         "operations": OPERATIONS,
@@ -217,14 +406,14 @@ async def moves_create(
     doc_type: str = Form(...),
     doc_number: str = Form(...),
 ):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
 
     payload = {"doc_type": doc_type, "doc_number": doc_number}
-    api_response = await _api_request("POST", "/moves", token, json=payload)
+    api_response = await _api_request("POST", "/moves", auth, json=payload)
     if api_response.status_code != status.HTTP_201_CREATED:
-        selected = next((op for op in OPERATIONS if op["doc_type"] == doc_type), None)
+        selected = OPERATIONS_BY_DOC_TYPE.get(doc_type)
         context = {
             "request": request,
             "operations": OPERATIONS,
@@ -234,20 +423,55 @@ async def moves_create(
         }
         return templates.TemplateResponse("moves_new.html", context, status_code=api_response.status_code)
 
-    move = api_response.json()
+    move = _json(api_response)
     return RedirectResponse(
         url=request.url_for("move_detail", move_id=move["id"]),
         status_code=status.HTTP_303_SEE_OTHER,
     )
 
 
+# Los fragmentos de Template.generate() son diminutos; se agrupan hasta este
+# tamaño antes de cada send, salvo el cierre de ``<head>``, que se envía en
+# cuanto se renderiza.
+_STREAM_CHUNK_SIZE = 8192
+
+
+def _stream_template(name: str, context: dict, status_code: int = 200) -> StreamingResponse:
+    """Envía la plantilla a medida que se renderiza.
+
+    El primer send sale al cerrar ``</head>``: el navegador empieza a pedir
+    CSS/JS mientras se renderiza el resto. El generador de Jinja es síncrono
+    y barato por paso: se recorre en el event loop en lugar de un salto al
+    threadpool por fragmento, que es lo que haría StreamingResponse con un
+    iterador síncrono.
+    """
+    chunks = templates.get_template(name).generate(context)
+
+    async def body() -> AsyncIterator[str]:
+        buffer: list[str] = []
+        size = 0
+        head_sent = False
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= _STREAM_CHUNK_SIZE or (not head_sent and "</head>" in chunk):
+                head_sent = head_sent or "</head>" in chunk
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+        if buffer:
+            yield "".join(buffer)
+
+    return StreamingResponse(body(), status_code=status_code, media_type="text/html")
+
+
 @app.get("/moves/{move_id}", response_class=HTMLResponse, name="move_detail")
 async def move_detail(request: Request, move_id: str):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
 
-    api_response = await _api_request("GET", f"/moves/{move_id}", token)
+    api_response = await _api_get(f"/moves/{move_id}", auth)
     if api_response.status_code == 404:
         context = {
             "request": request,
@@ -263,83 +487,88 @@ async def move_detail(request: Request, move_id: str):
         }
         return templates.TemplateResponse("move_detail.html", context, status_code=api_response.status_code)
 
-    move = api_response.json()
+    move = _json(api_response)
     context = {
         "request": request,
         "move": move,
         "error": None,
         "success_message": request.query_params.get("success"),
     }
-    return templates.TemplateResponse("move_detail.html", context)
+    return _stream_template("move_detail.html", context)
+
+
+async def _move_error_response(
+    request: Request, move_id: str, auth: dict[str, str], error: str, status_code: int
+) -> HTMLResponse:
+    # El movimiento sólo se pide para re-renderizar el detalle cuando algo
+    # falla; el camino feliz hace una única llamada a la API.
+    move_response = await _api_get(f"/moves/{move_id}", auth)
+    context = {
+        "request": request,
+        "move": _json(move_response) if move_response.status_code == 200 else None,
+        "error": error,
+    }
+    return templates.TemplateResponse("move_detail.html", context, status_code=status_code)
 
 
 @app.post("/moves/{move_id}/confirm")
 async def move_confirm(request: Request, move_id: str):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
 
-    move_response = await _api_request("GET", f"/moves/{move_id}", token)
-    if move_response.status_code != 200:
-        return templates.TemplateResponse(
-            "move_detail.html",
-            {
-                "request": request,
-                "move": None,
-                "error": "Movimiento no encontrado",
-            },
-            status_code=move_response.status_code,
-        )
-    move_payload = move_response.json() if move_response.status_code == 200 else None
-
     form = await request.form()
-    item_codes = form.getlist("item_code")
-    qtys = form.getlist("qty")
-    qty_confirmeds = form.getlist("qty_confirmed")
+    # Una pasada por los pares del formulario en lugar de un getlist por
+    # columna; las claves ajenas a las líneas se ignoran.
+    columns: dict[str, list[Any]] = {"item_code": [], "qty": [], "qty_confirmed": []}
+    for key, value in form.multi_items():
+        column = columns.get(key)
+        if column is not None:
+            column.append(value)
+    item_codes, qtys, qty_confirmeds = columns.values()
+
+    location_from = form.get("location_from", "MAIN")
+    location_to = form.get("location_to", "MAIN")
 
     lines: list[dict[str, Any]] = []
-    for idx, code in enumerate(item_codes):
+    # zip_longest: una columna más corta (p. ej. qty_confirmed vacío al final)
+    # se rellena con "" en vez de cortar o fallar por índice.
+    for code, raw_qty, raw_confirmed in zip_longest(item_codes, qtys, qty_confirmeds, fillvalue=""):
         code = code.strip()
         if not code:
             continue
-        try:
-            qty = int(qtys[idx])
-            qty_confirmed = int(qty_confirmeds[idx]) if qty_confirmeds[idx] else qty
-        except (ValueError, IndexError):
-            qty = None  # type: ignore[assignment]
-            qty_confirmed = 0
-        if qty is None or qty <= 0:
-            error_context = {
-                "request": request,
-                "move": move_payload,
-                "error": "Las cantidades deben ser enteros positivos.",
+        # isdecimal antes de int(): el camino normal no levanta excepciones y
+        # todo lo que pasa el chequeo es aceptado por int().
+        raw_qty = raw_qty.strip()
+        raw_confirmed = raw_confirmed.strip()
+        if not raw_qty.isdecimal() or (raw_confirmed and not raw_confirmed.isdecimal()):
+            return await _move_error_response(request, move_id, auth, "Las cantidades deben ser enteros positivos.", 400)
+        qty = int(raw_qty)
+        if qty <= 0:
+            return await _move_error_response(request, move_id, auth, "Las cantidades deben ser enteros positivos.", 400)
+        qty_confirmed = int(raw_confirmed) if raw_confirmed else qty
+        lines.append(
+            {
+                "item_code": code,
+                "qty": qty,
+                "qty_confirmed": max(0, min(qty_confirmed, qty)),
+                "location_from": location_from,
+                "location_to": location_to,
             }
-            return templates.TemplateResponse("move_detail.html", error_context, status_code=400)
-        line_payload = {
-            "item_code": code,
-            "qty": qty,
-            "qty_confirmed": max(0, min(qty_confirmed, qty)),
-            "location_from": form.get("location_from", "MAIN"),
-            "location_to": form.get("location_to", "MAIN"),
-        }
-        lines.append(line_payload)
+        )
 
     if not lines:
-        context = {
-            "request": request,
-            "move": move_payload,
-            "error": "Agrega al menos una línea antes de confirmar.",
-        }
-        return templates.TemplateResponse("move_detail.html", context, status_code=400)
+        return await _move_error_response(request, move_id, auth, "Agrega al menos una línea antes de confirmar.", 400)
 
-    api_response = await _api_request("POST", f"/moves/{move_id}/confirm", token, json={"lines": lines})
+    api_response = await _api_request("POST", f"/moves/{move_id}/confirm", auth, json={"lines": lines})
     if api_response.status_code != 200:
-        context = {
-            "request": request,
-            "move": move_payload,
-            "error": _safe_detail(api_response, "No se pudo confirmar el movimiento"),
-        }
-        return templates.TemplateResponse("move_detail.html", context, status_code=api_response.status_code)
+        return await _move_error_response(
+            request,
+            move_id,
+            auth,
+            _safe_detail(api_response, "No se pudo confirmar el movimiento"),
+            api_response.status_code,
+        )
 
     return RedirectResponse(
         url=f"{request.url_for('move_detail', move_id=move_id)}?success=Movimiento%20confirmado",
@@ -349,25 +578,31 @@ async def move_confirm(request: Request, move_id: str):
 
 @app.get("/print", response_class=HTMLResponse)
 async def print_labels(request: Request):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
 
-    jobs_response = await _api_request("GET", "/print/jobs", token)
-    jobs = jobs_response.json() if jobs_response.status_code == 200 else []
+    success = request.query_params.get("success")
+    # Tras encolar (redirect con ?success) la request puede caer en otro
+    # worker con la caché vieja: ese render va directo a la API.
+    if success:
+        jobs_response = await _api_get("/print/jobs", auth)
+    else:
+        jobs_response = await _cached_get("/print/jobs", auth)
+    jobs = _json(jobs_response) if jobs_response.status_code == 200 else []
     context = {
         "request": request,
         "jobs": jobs,
         "error": None,
-        "success": request.query_params.get("success"),
+        "success": success,
     }
     return templates.TemplateResponse("print_labels.html", context)
 
 
 @app.post("/print")
 async def print_labels_submit(request: Request, codes: str = Form(...), copies: int = Form(1)):
-    token = _require_token(request)
-    if token is None:
+    auth = _require_auth(request)
+    if auth is None:
         return RedirectResponse(url=request.url_for("login"), status_code=status.HTTP_303_SEE_OTHER)
 
     if copies < 1:
@@ -377,31 +612,44 @@ async def print_labels_submit(request: Request, codes: str = Form(...), copies:
 
     parsed_codes = [line.strip() for line in codes.splitlines() if line.strip()]
     if not parsed_codes:
-        jobs_response = await _api_request("GET", "/print/jobs", token)
+        jobs_response = await _cached_get("/print/jobs", auth)
         context = {
             "request": request,
-            "jobs": jobs_response.json() if jobs_response.status_code == 200 else [],
+            "jobs": _json(jobs_response) if jobs_response.status_code == 200 else [],
             "error": "Ingresa al menos un código de producto.",
         }
         return templates.TemplateResponse("print_labels.html", context, status_code=400)
 
+    semaphore = asyncio.Semaphore(PRINT_CONCURRENCY)
+
+    async def enqueue(code: str) -> httpx.Response:
+        async with semaphore:
+            return await _api_request(
+                "POST",
+                "/print/product",
+                auth,
+                json={"item_code": code, "copies": copies},
+            )
+
+    # Los códigos son independientes: se encolan en paralelo y el tiempo total
+    # es el de la llamada más lenta, no la suma.
+    responses = await asyncio.gather(*(enqueue(code) for code in parsed_codes), return_exceptions=True)
+    _invalidate_get("/print/jobs")
     failures: list[str] = []
-    for code in parsed_codes:
-        response = await _api_request(
-            "POST",
-            "/print/product",
-            token,
-            json={"item_code": code, "copies": copies},
-        )
-        if response.status_code not in {200, 201}:
+    for code, response in zip(parsed_codes, responses):
+        if isinstance(response, BaseException):
+            if not isinstance(response, httpx.HTTPError):
+                raise response
+            failures.append(f"{code}: Error al encolar impresión")
+        elif response.status_code not in {200, 201}:
             detail = _safe_detail(response, "Error al encolar impresión")
             failures.append(f"{code}: {detail}")
 
     if failures:
-        jobs_response = await _api_request("GET", "/print/jobs", token)
+        jobs_response = await _api_get("/print/jobs", auth)
         context = {
             "request": request,
-            "jobs": jobs_response.json() if jobs_response.status_code == 200 else [],
+            "jobs": _json(jobs_response) if jobs_response.status_code == 200 else [],
             "error": "\n".join(failures),
         }
         return templates.TemplateResponse("print_labels.html", context, status_code=400)
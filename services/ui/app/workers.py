@@ -0,0 +1,27 @@
+import os
+
+from uvicorn_worker import UvicornWorker
+
+# Tope de conexiones + tareas en vuelo por worker; al superarlo uvicorn
+# responde 503 de inmediato en lugar de encolar detrás del loop. Debe quedar
+# por debajo del pool del cliente httpx hacia picking-api (200 conexiones
+# por proceso, ver ``main.lifespan``).
+LIMIT_CONCURRENCY = int(os.getenv("UI_LIMIT_CONCURRENCY", "64"))
+
+
+class BoundedUvicornWorker(UvicornWorker):
+    """UvicornWorker con ``limit_concurrency``, que Gunicorn no expone.
+
+    ``limit_max_requests`` y ``backlog`` ya los toma UvicornWorker de
+    ``max_requests`` y ``backlog`` de la configuración de Gunicorn. uvloop y
+    httptools (de ``uvicorn[standard]``) se fijan explícitos en lugar de
+    "auto", para que su ausencia falle al arrancar y no degrade en silencio
+    al loop de asyncio y al parser h11.
+    """
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "loop": "uvloop",
+        "http": "httptools",
+        "limit_concurrency": LIMIT_CONCURRENCY,
+    }
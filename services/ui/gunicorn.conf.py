@@ -0,0 +1,27 @@
+"""Configuración de Gunicorn para la UI (app ASGI).
+
+Gunicorn la lee sola desde el directorio de trabajo (/app en la imagen).
+Cualquier valor se puede pisar con GUNICORN_CMD_ARGS, p. ej.
+``GUNICORN_CMD_ARGS="--workers 3 --timeout 60"``.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("UI_BIND", "0.0.0.0:8080")
+
+# FastAPI es ASGI: siempre un UvicornWorker (paquete uvicorn-worker; el
+# uvicorn.workers de uvicorn está deprecado), nunca gevent (WSGI). La
+# subclase agrega limit_concurrency por worker.
+worker_class = "app.workers.BoundedUvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", str(2 * multiprocessing.cpu_count() + 1)))
+
+backlog = int(os.getenv("UI_BACKLOG", "2048"))
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+
+# Reciclar workers acota el crecimiento de memoria (cachés en proceso).
+# UvicornWorker lo aplica como limit_max_requests.
+max_requests = 2000
+max_requests_jitter = 200